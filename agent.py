@@ -1,14 +1,25 @@
-from langgraph.graph import StateGraph, END
+import asyncio
 from typing import TypedDict, Annotated, Literal
-from tools import clone_github_repo, extract_all_repos_to_txt, text_to_pdf
+from tools import clone_github_repo, extract_all_repos_to_txt, extract_repo_at_commit, prefetch_mirror, text_to_pdf
+from intake import MIN_CONFIDENCE, normalize_role, parse_request
+from summarizer import load_sections
+from summary_tree import summarize_tree
+from retrieval import RETRIEVAL_TOKEN_BUDGET, retrieve
+from planner import finish_plan, plan_budget
 import os
-from openai import OpenAI
+from llm import chat, cache_stats
+from scheduler import PRIORITY_HIGH
+from profiling import add_node_record, finish_trace, format_summary, instrument_node, measured_call
 import re
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
 import json
-import markdown
-from weasyprint import HTML, CSS
+from renderer import get_renderer
+from artifacts import ArtifactRef, open_store
+from skeleton import EXTRACTION_MODE, mode_for_topic, skeletonize_sections
+import argparse
+import hashlib
+import threading
 
 load_dotenv()
 # === Define State ===
@@ -17,6 +28,25 @@ class State(BaseModel):
     extracted: bool
     summary: str
     pdf_path: str
+    mirror_path: str = ""
+    commit: str = ""
+    # Isolated run directory: <workspace>/OUTPUT holds every artifact of the run
+    workspace: str = "./repo_cloned"
+    # Free-text request, or the already known fields below (which skip the LLM extraction)
+    request: str = ""
+    repo_url: str = ""
+    type_of_user: str = ""
+    topic: str = ""
+    # Profiling trace the node timings are recorded under
+    run_id: str = ""
+    # Plain FPDF output instead of the styled WeasyPrint rendering
+    fast_pdf: bool = False
+    # Store for outputs.json, summaries and other artifacts passed between nodes
+    artifacts: ArtifactRef = Field(default_factory=ArtifactRef)
+    # "skeleton" sends signatures/docstrings instead of whole files; "auto" decides per topic
+    extraction_mode: Literal["auto", "full", "skeleton"] = EXTRACTION_MODE
+    # Tokens of repository content sent to the topic filter
+    token_budget: int = RETRIEVAL_TOKEN_BUDGET
 
 class UserInput(BaseModel):
     type_of_user: Literal["developer", "business_analyst", "product_manager", "technical_writer"]
@@ -25,6 +55,14 @@ class UserInput(BaseModel):
 
 base_path = "./repo_cloned/OUTPUT/"
 
+def output_path(state: State) -> str:
+    path = os.path.join(state.workspace, "OUTPUT", "")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def artifact_store(state: State):
+    return open_store(state.artifacts, output_path(state))
+
 user_input = """I'm a developer reviewing a GitHub repository, and I’d like your assistance in extracting and generating a clear report focused on the installation and setup process of the project.
 
 The goal is to identify all relevant instructions, dependencies, environment setup steps, configuration details, and anything else necessary to get the project running locally or in production (as applicable). I’m particularly interested in any setup documentation from the README, installation scripts, Dockerfiles, or other setup-related file from the following repository: https://github.com/marianfoo/mcp-sap-docs"""
@@ -46,9 +84,24 @@ def extract_json(text: str) -> dict:
         raise  # re-raise if nothing works
 
 def user_info_input(state: State) -> State:
-
-    client = OpenAI()
-    response = client.chat.completions.create(
+    store = artifact_store(state)
+    if state.repo_url and state.type_of_user and state.topic:
+        # Structured jobs (batch mode) already carry the fields
+        outpusjson = UserInput(repo_url=state.repo_url, type_of_user=state.type_of_user, topic=state.topic).model_dump()
+        store.put_json("outputs.json", outpusjson)
+        return {"summary": json.dumps(outpusjson, indent=2)}
+    request = state.request or user_input
+    parsed = parse_request(request)
+    local, scores = parsed["fields"], parsed["scores"]
+    if parsed["confidence"] >= MIN_CONFIDENCE:
+        print(f":zap: Parsed request locally (confidence {parsed['confidence']:.2f})")
+        outpusjson = UserInput(**local).model_dump()
+        store.put_json("outputs.json", outpusjson)
+        return {"summary": json.dumps(outpusjson, indent=2), **outpusjson}
+    if scores["repo_url"] >= MIN_CONFIDENCE:
+        # The URL is already known: fetch it while the model reads the rest
+        prefetch_mirror(local["repo_url"])
+    outputs = chat(
         model="gpt-4o",
         messages=[
             {"role": "system","content": """You are an information extraction specialist.
@@ -56,117 +109,103 @@ def user_info_input(state: State) -> State:
              the GitHub repository URL, the type of user, and the topic of the final report. 
              You will return this information in a JSON object with the following keys: 
              'repo_url', 'type_of_user', and 'topic'."""},
-            {"role": "user", "content":user_input},
+            {"role": "user", "content":request},
         ],
-        temperature=0.3
+        temperature=0.3,
+        priority=PRIORITY_HIGH
     )
-    outputs = response.choices[0].message.content
-    outpusjson = extract_json(outputs)
-    with open(base_path + "outputs.json", "w", encoding="utf-8") as f:
-        f.write(json.dumps(outpusjson, indent=2))
-    return {"summary": json.dumps(outpusjson, indent=2)}
+    extracted = extract_json(outputs)
+    # Fields the parser was sure about win over the model's
+    fields = {key: local[key] if scores[key] >= MIN_CONFIDENCE else extracted.get(key) or local[key]
+              for key in local}
+    fields["type_of_user"] = normalize_role(fields["type_of_user"])
+    outpusjson = UserInput(**fields).model_dump()
+    store.put_json("outputs.json", outpusjson)
+    # Later nodes read the fields from the state instead of re-parsing outputs.json
+    return {"summary": json.dumps(outpusjson, indent=2), **outpusjson}
 
 def node_clone_repo(state: State) -> State:
-    files = ["outputs.json"]
-    for f in files:
-        path = os.path.join(base_path, f)
-        if os.path.exists(path):
-            with open(base_path + "outputs.json", "r", encoding="utf-8") as f:
-                data = json.load(f) 
-                repo_url = data["repo_url"]
-    result = clone_github_repo(repo_url)
-    return {"repo_cloned": result["success"]}
+    # Only refresh the mirror: extraction streams blobs from it, no checkout needed
+    result = clone_github_repo(state.repo_url, commit=state.commit or None, checkout=False)
+    return {"repo_cloned": result["success"],
+            "mirror_path": result.get("mirror_path") or "",
+            "commit": result.get("commit") or ""}
 def node_extract_code(state: State) -> State:
-    result = extract_all_repos_to_txt()
+    base_path = output_path(state)
+    if state.mirror_path:
+        result = extract_repo_at_commit(state.mirror_path, state.commit or "HEAD", output_dir=base_path)
+    else:
+        result = extract_all_repos_to_txt(base_dir=state.workspace)
     return {"extracted": result["success"]}
 
 def node_topic_files_identify(state: State) -> State:
-    base_path = "./repo_cloned/OUTPUT/"
+    base_path = output_path(state)
+    store = artifact_store(state)
     files = ["readme.txt", "code.txt", "outputs.json"]
-    content = ""
-    for f in files:
-        path = os.path.join(base_path, f)
-        if os.path.exists(path):
-            with open(path, "r", encoding="utf-8", errors="ignore") as file:
-                content += file.read()
-            with open(base_path + "outputs.json", "r", encoding="utf-8") as f:
-                outputs = json.load(f)
-                topic = outputs["topic"]
-    client = OpenAI()
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": f"""You are a content filtration expert. 
+    topic = state.topic
+    # A rerun with a new topic or audience rewinds to this node: refresh the request artifact
+    store.put_json("outputs.json", UserInput(repo_url=state.repo_url, type_of_user=state.type_of_user,
+                                             topic=topic).model_dump())
+    sections = load_sections(base_path, files, store)
+    index_key = state.commit or None
+    mode = mode_for_topic(topic) if state.extraction_mode == "auto" else state.extraction_mode
+    if mode == "skeleton":
+        sections = skeletonize_sections(sections)
+        index_key = index_key and f"{index_key}-skeleton"
+    # Setup-critical files for the topic and audience are pinned first, the remaining
+    # budget goes to the chunks that rank best against the topic
+    plan = plan_budget(sections, topic, state.type_of_user, state.token_budget)
+    retrieved = retrieve(sections, topic, commit=index_key, token_budget=plan["remaining_tokens"],
+                         exclude=plan["exclude"])
+    store.put_json("budget_plan.json", finish_plan(plan, retrieved))
+    sections = plan["pinned"] + retrieved
+    system_prompt = f"""You are a content filtration expert. 
             Your task is to process the provided information and return only the content that is specifically about the following topic: {topic}. 
-            Do not include any other information or commentary."""},
-            {"role": "user", "content": content[:6000]},
-        ],
-        temperature=0.3
-    )
-    summary_code = response.choices[0].message.content
-    with open(base_path + "summary_code.txt", "w", encoding="utf-8") as f:
-        f.write(summary_code)
+            Do not include any other information or commentary."""
+    merge_prompt = f"""You are a content filtration expert. 
+            The provided text holds excerpts already filtered for the following topic: {topic}, one block per file or directory. 
+            Combine them into one text, keeping every file path and every detail about the topic and dropping repetitions. 
+            Do not include any other information or commentary."""
+    # Per-file summaries rolled up by directory; unchanged files and directories are reused
+    summary_code, tree = summarize_tree(sections, system_prompt, system_prompt, merge_prompt=merge_prompt)
+    if tree is not None:
+        store.put_json("summary_tree.json", tree)
+    store.put_text("summary_code.txt", summary_code)
     return {"summary": summary_code}
 
 def node_summarize_repo(state: State) -> State:
-    base_path = "./repo_cloned/OUTPUT/"
+    base_path = output_path(state)
+    store = artifact_store(state)
     files = ["readme.txt", "summary_code.txt", "outputs.json"]
-    content = ""
-    for f in files:
-        path = os.path.join(base_path, f)
-        if os.path.exists(path):
-            with open(path, "r", encoding="utf-8", errors="ignore") as file:
-                content += file.read()
-            with open(base_path + "outputs.json", "r", encoding="utf-8") as f:
-                outputs = json.load(f)
-                type_of_user = outputs["type_of_user"]
-                topic = outputs["topic"]
-    client = OpenAI()
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": f"""You are a technical project summary writer. 
+    type_of_user = state.type_of_user
+    topic = state.topic
+    sections = load_sections(base_path, files, store)
+    map_prompt = f"""You are a technical note taker. 
+            Extract every fact from the provided part of a GitHub repository that a {type_of_user} needs for a report about the following topic: {topic}. 
+            Return concise notes only, without commentary."""
+    merge_prompt = f"""You are a technical note taker. 
+            Combine the provided notes on parts of a GitHub repository into one set of notes for a {type_of_user} about the following topic: {topic}. 
+            Keep every fact and file path, drop repetitions, and return the notes only, without commentary."""
+    system_prompt = f"""You are a technical project summary writer. 
             Your task is to create a detailed, project-based summary of a GitHub repository. 
             This summary must be written for the {type_of_user} stakeholder audience. 
             The summary's main focus and title must be the following topic: {topic}. 
-            You will present the final summary in clean markdown format."""},
-            {"role": "user", "content": content[:6000]},
-        ],
-        temperature=0.3
-    )
-    summary = response.choices[0].message.content
-    with open(base_path + "summary.md", "w", encoding="utf-8") as f:
-        f.write(summary)
+            You will present the final summary in clean markdown format."""
+    summary, _ = summarize_tree(sections, map_prompt, system_prompt, merge_prompt=merge_prompt)
+    store.put_text("summary.md", summary)
     return {"summary": summary}
 
 
 def node_generate_pdf(state: State) -> State:
-    base_path = "./repo_cloned/OUTPUT/"
-    path = "repo_cloned/OUTPUT/summary.md"
-    with open(path, 'r', encoding='utf-8') as f:
-        md_text = f.read()
-
-    # Convert markdown to HTML
-    html_content = markdown.markdown(md_text, extensions=['extra', 'codehilite', 'tables'])
-
-    # Wrap HTML in a basic structure
-    full_html = f"""
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <style>
-                body {{ font-family: sans-serif; margin: 2em; }}
-            </style>
-        </head>
-        <body>
-            {html_content}
-        </body>
-        </html>
-    """
+    base_path = output_path(state)
+    # The summarize node leaves the report in the state; the store is the fallback
+    md_text = state.summary or artifact_store(state).get_text("summary.md", "")
 
-    # Load CSS if provided
-    css = CSS(filename="style/style.css")  # adjust path if needed
-    HTML(string=full_html).write_pdf(target=f"{base_path}/output.pdf", stylesheets=[css])
+    # Warm renderer: WeasyPrint, fonts and style/style.css are loaded once per process
+    result = get_renderer().render(md_text, f"{base_path}output.pdf", fast=state.fast_pdf or None)
+    if not result["success"]:
+        print(result["message"])
+    return {"pdf_path": result["output_path"] or ""}
 
     # if not os.path.exists(path):
     #     return {"pdf_path": ""}
@@ -175,23 +214,102 @@ def node_generate_pdf(state: State) -> State:
     # result = text_to_pdf(content, filename="output.pdf")
     # return {"pdf_path": result["output_path"] if result["success"] else ""}
 # === Build LangGraph ===
-builder = StateGraph(State)
-builder.add_node("user_info_input", user_info_input)
-builder.add_node("clone", node_clone_repo)
-builder.add_node("extract", node_extract_code)
-builder.add_node("topic_files_identify", node_topic_files_identify)
-builder.add_node("summarize", node_summarize_repo)
-builder.add_node("pdf", node_generate_pdf)
-builder.set_entry_point("user_info_input")
-builder.add_edge("user_info_input", "clone")
-builder.add_edge("clone", "extract")
-builder.add_edge("extract", "topic_files_identify")
-builder.add_edge("topic_files_identify", "summarize")
-builder.add_edge("summarize", "pdf")
-builder.add_edge("pdf", END)
-app = builder.compile()
+# CPU-bound nodes that batch mode moves to a process pool
+CPU_NODES = {"extract", "pdf"}
+# State fields each node reads, in graph order: a resumed run whose inputs changed re-runs
+# from the first node whose fields differ (see checkpoints.resume_point). The structured
+# request fields count at the nodes that consume them, so a new topic keeps the clone
+NODE_INPUTS = {
+    "user_info_input": ["request"],
+    "clone": ["repo_url"],
+    "extract": ["workspace", "commit", "mirror_path"],
+    "topic_files_identify": ["topic", "type_of_user", "extraction_mode", "token_budget"],
+    "summarize": ["type_of_user", "topic"],
+    "pdf": ["fast_pdf"],
+}
+# Fields a caller may set when starting or resuming a run
+RUN_INPUTS = {"request", "repo_url", "type_of_user", "topic", "extraction_mode", "token_budget", "fast_pdf",
+              "workspace", "artifacts"}
+
+def _offload(name, node, executor):
+    async def run_in_executor(state: State) -> State:
+        # Measured inside the worker process; only the record comes back
+        result, record = await asyncio.get_running_loop().run_in_executor(executor, measured_call, node, name, state)
+        add_node_record(state.run_id or "default", record)
+        return result
+    return run_in_executor
+
+def build_graph(cpu_executor=None, checkpointer=None):
+    """
+    Compile the report graph. With `cpu_executor` (e.g. a ProcessPoolExecutor) the CPU-bound
+    nodes run there when the graph is driven with `ainvoke`.
+    Every node is profiled into the trace of the state's `run_id` (see profiling.py).
+    With `checkpointer` the state is saved after each node under the run ID, so the run can be
+    resumed with checkpoints.run_resumable().
+    """
+    # LangGraph is only imported by the entry points that actually run a graph
+    from langgraph.graph import StateGraph, END
+    nodes = {
+        "user_info_input": user_info_input,
+        "clone": node_clone_repo,
+        "extract": node_extract_code,
+        "topic_files_identify": node_topic_files_identify,
+        "summarize": node_summarize_repo,
+        "pdf": node_generate_pdf,
+    }
+    builder = StateGraph(State)
+    for name, node in nodes.items():
+        if cpu_executor is not None and name in CPU_NODES:
+            node = _offload(name, node, cpu_executor)
+        else:
+            node = instrument_node(name, node)
+        builder.add_node(name, node)
+    builder.set_entry_point("user_info_input")
+    builder.add_edge("user_info_input", "clone")
+    builder.add_edge("clone", "extract")
+    builder.add_edge("extract", "topic_files_identify")
+    builder.add_edge("topic_files_identify", "summarize")
+    builder.add_edge("summarize", "pdf")
+    builder.add_edge("pdf", END)
+    return builder.compile(checkpointer=checkpointer)
+
+_app = None
+_app_lock = threading.Lock()
+
+def get_app():
+    """
+    The report graph without checkpointer, compiled once on first use.
+    """
+    global _app
+    with _app_lock:
+        if _app is None:
+            _app = build_graph()
+        return _app
+
+def __getattr__(name):
+    # `from agent import app` keeps working without compiling the graph at import time
+    if name == "app":
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 # === Run LangGraph ===
 if __name__ == "__main__":
-    result = app.invoke({"repo_cloned": False, "extracted": False, "summary": "", "pdf_path": ""})
+    parser = argparse.ArgumentParser(description="Generate a report about a GitHub repository")
+    # Derived from the request, so rerunning after a failure resumes the failed run
+    parser.add_argument("--run-id", default=f"run-{hashlib.sha1(user_input.encode('utf-8')).hexdigest()[:12]}",
+                        help="Checkpoint key; rerunning with the same ID resumes the run")
+    parser.add_argument("--fresh", action="store_true", help="Ignore the checkpoints of --run-id")
+    args = parser.parse_args()
+    from checkpoints import get_checkpointer, run_resumable
+    run_id = args.run_id
+    print(f":label: Run ID: {run_id}")
+    result = run_resumable(build_graph(checkpointer=get_checkpointer()),
+                           {"repo_cloned": False, "extracted": False, "summary": "", "pdf_path": ""},
+                           run_id, NODE_INPUTS, RUN_INPUTS, fresh=args.fresh)
     print(":white_check_mark: Final output:")
-    print(result)
\ No newline at end of file
+    print(result)
+    print(f":card_file_box: LLM cache: {cache_stats()}")
+    trace_path = os.path.join(result.get("workspace") or "./repo_cloned", "OUTPUT", "trace.json")
+    trace = finish_trace(run_id, trace_path)
+    print(f":stopwatch: Profile ({trace_path}):")
+    print(format_summary(trace))
\ No newline at end of file
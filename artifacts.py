@@ -0,0 +1,230 @@
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Literal
+from pydantic import BaseModel
+from tools import atomic_write
+
+# Where the artifacts of a run live by default: "disk" keeps the historical files in
+# <workspace>/OUTPUT, "memory" keeps nothing on disk, "zstd" stores compressed files
+ARTIFACT_BACKEND = os.getenv("ARTIFACT_BACKEND", "disk")
+ZSTD_LEVEL = int(os.getenv("ARTIFACT_ZSTD_LEVEL", "3"))
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+class ArtifactRef(BaseModel):
+    """
+    Serializable pointer to a run's artifact store, carried in the graph State so nodes in
+    other threads or processes open the same store.
+    """
+    backend: Literal["memory", "disk", "zstd"] = ARTIFACT_BACKEND
+    # Directory of the disk backends / key of the memory backend; empty means <workspace>/OUTPUT
+    root: str = ""
+
+def run_ref(values: dict) -> ArtifactRef:
+    """
+    Artifact reference of a run from its (final or checkpointed) state values.
+    """
+    ref = (values or {}).get("artifacts")
+    return ArtifactRef.model_validate(ref) if ref else ArtifactRef()
+
+class ArtifactStore(ABC):
+    """
+    Named artifacts of one run. Decoded text is kept until the artifact changes, so nodes
+    asking for the same artifact do not re-read or re-decode it. Names missing from the
+    store are read through from `fallback_dir` (files written directly by the extraction).
+    """
+    def __init__(self, fallback_dir: str = None):
+        self.fallback_dir = Path(fallback_dir) if fallback_dir else None
+        self._lock = threading.Lock()
+        self._text_cache = {}
+        self.stats = {"reads": 0, "writes": 0, "cache_hits": 0}
+
+    # Backend hooks
+    @abstractmethod
+    def _read(self, name: str):
+        """
+        Stored bytes of `name`, or None when it is missing.
+        """
+
+    @abstractmethod
+    def _write(self, name: str, data: bytes) -> None:
+        """
+        Store `data` under `name`, replacing any previous content.
+        """
+
+    @abstractmethod
+    def _stamp(self, name: str):
+        """
+        Token that changes whenever `name` changes (None when missing); validates the text cache.
+        """
+
+    def _fallback_path(self, name: str):
+        if self.fallback_dir is None:
+            return None
+        path = self.fallback_dir / name
+        return path if path.is_file() else None
+
+    def stamp(self, name: str):
+        """
+        Version marker of an artifact, or None when it does not exist.
+        """
+        stamp = self._stamp(name)
+        if stamp is not None:
+            return ("store", stamp)
+        path = self._fallback_path(name)
+        if path is not None:
+            stat = path.stat()
+            return ("file", stat.st_mtime_ns, stat.st_size)
+        return None
+
+    def exists(self, name: str) -> bool:
+        return self.stamp(name) is not None
+
+    def get_bytes(self, name: str):
+        self.stats["reads"] += 1
+        data = self._read(name)
+        if data is None:
+            path = self._fallback_path(name)
+            if path is not None:
+                data = path.read_bytes()
+        return data
+
+    def get_text(self, name: str, default: str = None):
+        stamp = self.stamp(name)
+        if stamp is None:
+            return default
+        with self._lock:
+            cached = self._text_cache.get(name)
+            if cached is not None and cached[0] == stamp:
+                self.stats["cache_hits"] += 1
+                return cached[1]
+        data = self.get_bytes(name)
+        if data is None:
+            return default
+        text = data.decode("utf-8", errors="ignore")
+        with self._lock:
+            self._text_cache[name] = (stamp, text)
+        return text
+
+    def get_json(self, name: str, default=None):
+        text = self.get_text(name)
+        return json.loads(text) if text is not None else default
+
+    def put_bytes(self, name: str, data: bytes) -> None:
+        self.stats["writes"] += 1
+        with self._lock:
+            self._text_cache.pop(name, None)
+        self._write(name, data)
+
+    def put_text(self, name: str, text: str) -> None:
+        self.put_bytes(name, text.encode("utf-8"))
+        with self._lock:
+            self._text_cache[name] = (self.stamp(name), text)
+
+    def put_json(self, name: str, value) -> None:
+        self.put_text(name, json.dumps(value, indent=2))
+
+class MemoryStore(ArtifactStore):
+    def __init__(self, fallback_dir: str = None):
+        super().__init__(fallback_dir)
+        self._data = {}
+        self._version = 0
+
+    def _read(self, name: str):
+        entry = self._data.get(name)
+        return entry[1] if entry else None
+
+    def _write(self, name: str, data: bytes) -> None:
+        with self._lock:
+            self._version += 1
+            self._data[name] = (self._version, data)
+
+    def _stamp(self, name: str):
+        entry = self._data.get(name)
+        return entry[0] if entry else None
+
+class DiskStore(ArtifactStore):
+    def __init__(self, root: str, fallback_dir: str = None):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        super().__init__(fallback_dir if fallback_dir and Path(fallback_dir) != self.root else None)
+
+    def _path(self, name: str) -> Path:
+        return self.root / name
+
+    def _encode(self, data: bytes) -> bytes:
+        return data
+
+    def _decode(self, data: bytes) -> bytes:
+        return data
+
+    def _read(self, name: str):
+        try:
+            return self._decode(self._path(name).read_bytes())
+        except FileNotFoundError:
+            return None
+
+    def _write(self, name: str, data: bytes) -> None:
+        atomic_write(self._path(name), self._encode(data))
+
+    def _stamp(self, name: str):
+        try:
+            stat = self._path(name).stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+class ZstdStore(DiskStore):
+    """
+    Disk store writing <name>.zst; plain files in the same directory are still readable.
+    """
+    def __init__(self, root: str, level: int = ZSTD_LEVEL):
+        import zstandard
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._decompressor = zstandard.ZstdDecompressor()
+        super().__init__(root)
+        self.fallback_dir = self.root
+
+    def _path(self, name: str) -> Path:
+        return self.root / f"{name}.zst"
+
+    def _encode(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def _decode(self, data: bytes) -> bytes:
+        return self._decompressor.decompress(data)
+
+def open_store(ref: ArtifactRef, default_root: str) -> ArtifactStore:
+    """
+    Process-wide store for a reference, created on first use. `default_root` is the run's
+    OUTPUT directory, used when the reference has no root and as read-through for memory.
+    """
+    root = ref.root or default_root
+    key = (ref.backend, os.path.abspath(root))
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            if ref.backend == "memory":
+                store = MemoryStore(fallback_dir=default_root)
+            elif ref.backend == "zstd":
+                try:
+                    store = ZstdStore(root)
+                except ImportError:
+                    print(":warning: zstandard not installed, storing artifacts uncompressed")
+                    store = DiskStore(root)
+            else:
+                store = DiskStore(root, fallback_dir=default_root)
+            _stores[key] = store
+        return store
+
+def release_store(ref: ArtifactRef, default_root: str) -> None:
+    """
+    Forget a run's store (and its memory) once the run is finished.
+    """
+    root = ref.root or default_root
+    with _stores_lock:
+        _stores.pop((ref.backend, os.path.abspath(root)), None)
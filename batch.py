@@ -0,0 +1,145 @@
+"""
+Batch mode: run many reports concurrently, each in its own workspace.
+
+    python batch.py jobs.json --parallel 8 --cpu-workers 4
+
+jobs.json is a JSON list (or JSON Lines) of {"repo_url", "type_of_user", "topic"} objects.
+Every job is checkpointed under its job ID: running the same jobs file again resumes the
+jobs that failed midway and re-runs the finished ones against the current upstream HEAD
+(--fresh starts every job over).
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from agent import NODE_INPUTS, RUN_INPUTS, UserInput, build_graph
+from checkpoints import arun_resumable, get_checkpointer
+from profiling import finish_trace
+from renderer import warm_renderer
+from artifacts import release_store, run_ref
+
+RUNS_DIR = Path(os.getenv("RUNS_DIR", "runs"))
+
+def job_id_for(job: UserInput, index: int) -> str:
+    name = re.sub(r"[^A-Za-z0-9_.-]+", "-", job.repo_url.rstrip("/").split("/")[-1].replace(".git", ""))
+    digest = hashlib.sha1(f"{index}:{job.model_dump_json()}".encode("utf-8")).hexdigest()[:8]
+    return f"{index:04d}-{name}-{digest}"
+
+def load_jobs(path: str) -> list:
+    """
+    Read jobs from a JSON list or JSON Lines file; each entry is validated as UserInput.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read().strip()
+    if text.startswith("["):
+        entries = json.loads(text)
+    else:
+        entries = [json.loads(line) for line in text.splitlines() if line.strip()]
+    jobs = []
+    for entry in entries:
+        if isinstance(entry, (list, tuple)):
+            entry = dict(zip(("repo_url", "type_of_user", "topic"), entry))
+        jobs.append(UserInput(**entry))
+    return jobs
+
+async def run_report(app, inputs: dict, job_id: str, workspace, fresh: bool = False) -> dict:
+    """
+    Run (or resume) one report under `job_id` in `workspace`, then write its trace and
+    release its artifact store. Returns the status, error, pdf_path and profile totals.
+    Shared by batch and service mode.
+    """
+    output_dir = os.path.join(workspace, "OUTPUT")
+    result = None
+    try:
+        result = await arun_resumable(app, {
+            "repo_cloned": False, "extracted": False, "summary": "", "pdf_path": "",
+            "workspace": str(workspace), **inputs
+        }, job_id, NODE_INPUTS, RUN_INPUTS, fresh=fresh)
+        pdf_path = result.get("pdf_path") or ""
+        if not result.get("repo_cloned"):
+            error = "clone failed"
+        elif not result.get("extracted"):
+            error = "extraction failed"
+        elif not pdf_path:
+            error = "no PDF produced"
+        else:
+            error = None
+        if error is not None:
+            # The graph finished, so there is no failed node to resume: retry from scratch
+            app.checkpointer.delete_thread(job_id)
+    except Exception as e:
+        error, pdf_path = f"{e.__class__.__name__}: {e}", ""
+        # The run's artifact reference is in its last checkpoint
+        result = app.get_state({"configurable": {"thread_id": job_id}}).values
+    trace = finish_trace(job_id, os.path.join(output_dir, "trace.json"))
+    release_store(run_ref(result), output_dir)
+    return {"status": "ok" if error is None else "failed", "error": error, "pdf_path": pdf_path,
+            "profile": trace["totals"]}
+
+async def run_job(app, job: UserInput, job_id: str, semaphore: asyncio.Semaphore, fast_pdf: bool = False,
+                  fresh: bool = False) -> dict:
+    workspace = RUNS_DIR / job_id
+    async with semaphore:
+        start = time.perf_counter()
+        print(f":rocket: [{job_id}] {job.repo_url} ({job.type_of_user}: {job.topic})")
+        report = await run_report(app, {"fast_pdf": fast_pdf, **job.model_dump()}, job_id, workspace, fresh)
+        seconds = time.perf_counter() - start
+        icon = ":white_check_mark:" if report["status"] == "ok" else ":x:"
+        print(f"{icon} [{job_id}] {report['status']} in {seconds:.1f}s {report['pdf_path'] or report['error']}")
+        return {"job_id": job_id, **job.model_dump(), "workspace": str(workspace), "status": report["status"],
+                "pdf_path": report["pdf_path"], "error": report["error"], "seconds": round(seconds, 3),
+                "profile": report["profile"]}
+
+async def run_batch_async(jobs: list, parallel: int = 4, cpu_workers: int = None, fast_pdf: bool = False,
+                          fresh: bool = False) -> list:
+    """
+    Run every job through the report graph. LLM and I/O nodes run on the event loop's
+    threads, extraction and PDF rendering on a process pool; at most `parallel` jobs at once.
+    Pool workers warm their PDF renderer on start and keep it for every job they render.
+    """
+    semaphore = asyncio.Semaphore(parallel)
+    # spawn: forking a process that already holds HTTP pools and threads is unsafe
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=cpu_workers or os.cpu_count(), mp_context=context,
+                             initializer=warm_renderer) as pool:
+        app = build_graph(cpu_executor=pool, checkpointer=get_checkpointer())
+        return await asyncio.gather(*[
+            run_job(app, job, job_id_for(job, i), semaphore, fast_pdf, fresh) for i, job in enumerate(jobs)
+        ])
+
+def run_batch(jobs: list, parallel: int = 4, cpu_workers: int = None, fast_pdf: bool = False,
+              fresh: bool = False) -> dict:
+    """
+    Blocking entry point; writes runs/batch-<timestamp>.json with one result per job.
+    """
+    start = time.perf_counter()
+    results = asyncio.run(run_batch_async(jobs, parallel, cpu_workers, fast_pdf, fresh))
+    report = {
+        "jobs": len(results),
+        "succeeded": sum(r["status"] == "ok" for r in results),
+        "failed": sum(r["status"] != "ok" for r in results),
+        "seconds": round(time.perf_counter() - start, 3),
+        "results": results
+    }
+    RUNS_DIR.mkdir(parents=True, exist_ok=True)
+    report_path = RUNS_DIR / f"batch-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f":bar_chart: {report['succeeded']}/{report['jobs']} reports in {report['seconds']}s, see {report_path}")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("jobs", help="JSON or JSON Lines file of jobs")
+    parser.add_argument("--parallel", type=int, default=4, help="reports running at the same time")
+    parser.add_argument("--cpu-workers", type=int, default=None, help="processes for extraction and PDF")
+    parser.add_argument("--fast-pdf", action="store_true", help="plain FPDF output instead of WeasyPrint")
+    parser.add_argument("--fresh", action="store_true", help="ignore the checkpoints of earlier runs")
+    args = parser.parse_args()
+    run_batch(load_jobs(args.jobs), args.parallel, args.cpu_workers, args.fast_pdf, args.fresh)
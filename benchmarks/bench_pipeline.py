@@ -0,0 +1,193 @@
+"""
+End-to-end benchmark of the report pipeline on a synthetic repository, with the local
+OpenAI stub instead of the real API. Reports per-stage latency percentiles, throughput
+and peak memory as JSON.
+
+    python benchmarks/bench_pipeline.py --files 2000 --repeat 5 --latency-ms 200 --output bench.json
+    python benchmarks/bench_pipeline.py --files 2000 --repeat 5 --compare bench.json
+
+Every iteration starts from empty caches (mirror, extraction, retrieval, summary tree, LLM
+responses) unless --warm is given, in which case only the first iteration is cold.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from stub_openai import StubConfig, start_stub_server
+from synth_repo import make_repo, parse_mix
+
+STAGES = ["clone", "extract_worktree", "extract_commit", "topic_files_identify", "summarize", "pdf"]
+# Stages whose work scales with the repository, so files/sec and MB/sec are meaningful
+REPO_STAGES = {"clone", "extract_worktree", "extract_commit"}
+
+
+def percentile(values: list, q: float) -> float:
+    # Nearest-rank percentile; exact for the small sample sizes of a benchmark
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), round(q / 100 * len(ordered) + 0.5)))
+    return ordered[rank - 1]
+
+
+def summarize_stage(name: str, records: list, repo: dict) -> dict:
+    walls = [r["wall_s"] for r in records]
+    p50 = percentile(walls, 50)
+    result = {
+        "runs": len(records),
+        "wall_s": {"mean": round(sum(walls) / len(walls), 4), "min": min(walls), "p50": p50,
+                   "p90": percentile(walls, 90), "p99": percentile(walls, 99), "max": max(walls)},
+        "cpu_s_mean": round(sum(r["cpu_s"] for r in records) / len(records), 4),
+        "peak_rss_mb": max((r["peak_rss_mb"] for r in records if r.get("peak_rss_mb") is not None), default=None),
+        "errors": [r["error"] for r in records if r.get("error")],
+    }
+    if name in REPO_STAGES and p50:
+        result["throughput"] = {"files_per_s": round(repo["files"] / p50, 1),
+                                "mb_per_s": round(repo["bytes"] / 1e6 / p50, 2)}
+    calls = sum(r["llm_calls"] for r in records)
+    if calls:
+        tokens = sum(r["prompt_tokens"] + r["completion_tokens"] for r in records)
+        result["llm"] = {"calls_per_run": calls / len(records), "tokens_per_run": tokens / len(records),
+                         "cached": sum(r["llm_cached"] for r in records),
+                         "tokens_per_s": round(tokens / sum(walls), 1)}
+    return result
+
+
+def run_iteration(source: str, workspace: Path, run_id: str, stage_records: dict, topic: str) -> None:
+    import agent
+    import tools
+    from artifacts import release_store
+    from profiling import measure
+
+    def stage(name, fn):
+        # measure() samples the peak RSS of each stage on its own background thread
+        with measure(name) as record:
+            try:
+                result = fn()
+            except Exception as e:
+                record["error"] = f"{e.__class__.__name__}: {e}"
+                result = None
+        stage_records[name].append(record)
+        return result
+
+    repo_dir = workspace / "synthetic"
+    cloned = stage("clone", lambda: tools.clone_github_repo(source, local_path=str(repo_dir)))
+    if not cloned or not cloned["success"]:
+        raise RuntimeError(f"clone failed: {cloned and cloned['message']}")
+    stage("extract_worktree", lambda: tools.extract_all_repos_to_txt(base_dir=str(workspace)))
+    output_dir = workspace / "OUTPUT"
+    stage("extract_commit", lambda: tools.extract_repo_at_commit(cloned["mirror_path"], cloned["commit"],
+                                                                 output_dir=str(output_dir)))
+    state = agent.State(repo_cloned=True, extracted=True, summary="", pdf_path="", workspace=str(workspace),
+                        mirror_path=cloned["mirror_path"], commit=cloned["commit"], run_id=run_id,
+                        repo_url=source, type_of_user="developer", topic=topic)
+    agent.artifact_store(state).put_json("outputs.json", {"repo_url": source, "type_of_user": "developer",
+                                                          "topic": topic})
+    stage("topic_files_identify", lambda: agent.node_topic_files_identify(state))
+    state.summary = (stage("summarize", lambda: agent.node_summarize_repo(state)) or {}).get("summary", "")
+    stage("pdf", lambda: agent.node_generate_pdf(state))
+    release_store(state.artifacts, str(output_dir))
+
+
+def clear_caches() -> None:
+    import llm
+    import summary_tree
+    import tools
+    from retrieval import RETRIEVAL_DIR
+    shutil.rmtree(tools.MIRROR_DIR, ignore_errors=True)
+    shutil.rmtree(RETRIEVAL_DIR, ignore_errors=True)
+    with summary_tree._store_lock:
+        if hasattr(summary_tree._store, "close"):
+            summary_tree._store.close()
+        summary_tree._store = None
+    shutil.rmtree(summary_tree.SUMMARY_CACHE_DIR, ignore_errors=True)
+    tools.get_extraction_cache().clear()
+    if llm.get_cache() is not None:
+        llm.get_cache().clear()
+
+
+def compare(current: dict, baseline: dict) -> None:
+    print(f"{'stage':<22}{'p50 before':>12}{'p50 now':>12}{'change':>10}")
+    for name, stats in current["stages"].items():
+        before = baseline.get("stages", {}).get(name)
+        if not before:
+            continue
+        old, new = before["wall_s"]["p50"], stats["wall_s"]["p50"]
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "-"
+        print(f"{name:<22}{old:>12.3f}{new:>12.3f}{change:>10}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--min-kb", type=float, default=1)
+    parser.add_argument("--max-kb", type=float, default=16)
+    parser.add_argument("--languages", default="py=5,js=2,ts=2,go=1,md=1")
+    parser.add_argument("--binary-ratio", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--warm", action="store_true", help="keep caches between iterations")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="stub latency per completion")
+    parser.add_argument("--ms-per-token", type=float, default=0.0)
+    parser.add_argument("--topic", default="installation and setup")
+    parser.add_argument("--output", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", help="previous JSON report to compare p50 latencies against")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary directory")
+    args = parser.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench-pipeline-"))
+    # Caches must point at the scratch directory before tools/llm are imported
+    os.environ["REPO_CACHE_DIR"] = str(tmp / "cache")
+    server, base_url = start_stub_server(StubConfig(latency_ms=args.latency_ms, ms_per_token=args.ms_per_token,
+                                                    seed=args.seed))
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+    try:
+        start = time.perf_counter()
+        repo = make_repo(str(tmp / "source"), args.files, args.depth, args.min_kb, args.max_kb,
+                         parse_mix(args.languages), args.binary_ratio, seed=args.seed)
+        generate_s = time.perf_counter() - start
+        source = (tmp / "source").resolve().as_uri()
+        records = {name: [] for name in STAGES}
+        for i in range(args.repeat):
+            if not args.warm:
+                clear_caches()
+            workspace = tmp / f"run{i}"
+            run_iteration(source, workspace, f"bench-{i}", records, args.topic)
+            shutil.rmtree(workspace, ignore_errors=True)
+        report = {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "keep")},
+            "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                            "cpu_count": os.cpu_count()},
+            "repo": {**{k: v for k, v in repo.items() if k != "path"}, "generate_s": round(generate_s, 3)},
+            "stages": {name: summarize_stage(name, stage_records, repo) for name, stage_records in records.items()},
+            "stub": server.config.stats,
+        }
+    finally:
+        server.shutdown()
+        if not args.keep:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f":bar_chart: Report written to {args.output}")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
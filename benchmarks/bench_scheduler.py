@@ -0,0 +1,67 @@
+"""
+Exercise the LLM scheduler against the local stub: concurrent sync and async callers,
+injected 429s with Retry-After, latency, and a server-side RPM limit.
+
+    python benchmarks/bench_scheduler.py --calls 200 --rate-429 0.2 --latency-ms 100
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from stub_openai import StubConfig, start_stub_server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8, help="synchronous callers (like parallel reports)")
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--rate-429", type=float, default=0.2)
+    parser.add_argument("--retry-after", type=float, default=0.2)
+    parser.add_argument("--server-rpm", type=int, default=0, help="stub-side RPM limit (0 = none)")
+    parser.add_argument("--rpm", type=int, default=600, help="scheduler RPM budget")
+    parser.add_argument("--tpm", type=int, default=10_000_000, help="scheduler TPM budget")
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(StubConfig(latency_ms=args.latency_ms, rate_429=args.rate_429,
+                                                    retry_after=args.retry_after, rpm_limit=args.server_rpm))
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    import llm
+    import scheduler
+
+    scheduler._scheduler = scheduler.LLMScheduler(rpm=args.rpm, tpm=args.tpm, max_concurrency=args.concurrency,
+                                                  base_delay=0.1, max_delay=2.0)
+    half = args.calls // 2
+
+    def sync_call(i: int) -> str:
+        return llm.chat([{"role": "user", "content": f"sync request {i}"}], use_cache=False)
+
+    async def async_calls() -> list:
+        return await asyncio.gather(*[
+            llm.achat([{"role": "user", "content": f"async request {i}"}], use_cache=False)
+            for i in range(half, args.calls)
+        ])
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        sync_results = pool.map(sync_call, range(half))
+        async_results = asyncio.run(async_calls())
+        completed = len(list(sync_results)) + len(async_results)
+    elapsed = time.perf_counter() - start
+
+    print(f"completed {completed}/{args.calls} calls in {elapsed:.2f}s ({completed / elapsed:.1f} calls/sec)")
+    print(f"scheduler: {scheduler.get_scheduler().stats}")
+    print(f"stub:      {server.config.stats}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Local OpenAI-compatible stub for /v1/chat/completions with deterministic latency,
+injected 429s and an optional requests-per-minute limit.
+
+    python benchmarks/stub_openai.py --port 8808 --latency-ms 200 --rate-429 0.2
+    OPENAI_BASE_URL=http://127.0.0.1:8808/v1 OPENAI_API_KEY=stub python agent.py
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubConfig:
+    def __init__(self, latency_ms: float = 0.0, ms_per_token: float = 0.0, rate_429: float = 0.0,
+                 retry_after: float = 1.0, rpm_limit: int = 0, completion_words: int = 200, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.ms_per_token = ms_per_token
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.rpm_limit = rpm_limit
+        self.completion_words = completion_words
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.recent = deque()
+        self.stats = {"requests": 0, "completed": 0, "rate_limited": 0}
+
+
+def _handler(config: StubConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, body: dict, headers: dict = None) -> None:
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _throttled(self) -> bool:
+            with config.lock:
+                config.stats["requests"] += 1
+                now = time.monotonic()
+                while config.recent and now - config.recent[0] >= 60:
+                    config.recent.popleft()
+                over_limit = config.rpm_limit and len(config.recent) >= config.rpm_limit
+                injected = config.rng.random() < config.rate_429
+                if over_limit or injected:
+                    config.stats["rate_limited"] += 1
+                    return True
+                config.recent.append(now)
+                return False
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+                return
+            if self._throttled():
+                self._send(429, {"error": {"message": "Rate limit reached (stub)", "type": "rate_limit_error",
+                                           "code": "rate_limit_exceeded"}},
+                           {"retry-after": str(config.retry_after)})
+                return
+            prompt = "".join(m.get("content") or "" for m in body.get("messages", []))
+            prompt_tokens = len(prompt) // 4 + 1
+            digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+            content = f"Stub summary {digest[:12]}. " + " ".join(["lorem"] * config.completion_words)
+            completion_tokens = config.completion_words + 4
+            time.sleep((config.latency_ms + config.ms_per_token * completion_tokens) / 1000)
+            with config.lock:
+                config.stats["completed"] += 1
+            self._send(200, {
+                "id": f"chatcmpl-{digest[:24]}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens}
+            })
+
+    return Handler
+
+
+def start_stub_server(config: StubConfig = None, host: str = "127.0.0.1", port: int = 0):
+    """
+    Start the stub in a daemon thread; returns (server, base_url). Call server.shutdown() to stop.
+    """
+    config = config or StubConfig()
+    server = ThreadingHTTPServer((host, port), _handler(config))
+    server.daemon_threads = True
+    server.config = config
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_port}/v1"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8808)
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="fixed latency per completion")
+    parser.add_argument("--ms-per-token", type=float, default=0.0, help="extra latency per completion token")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--rpm-limit", type=int, default=0, help="429 once this many requests ran in 60 s")
+    parser.add_argument("--completion-words", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    config = StubConfig(args.latency_ms, args.ms_per_token, args.rate_429, args.retry_after,
+                        args.rpm_limit, args.completion_words, args.seed)
+    server, base_url = start_stub_server(config, args.host, args.port)
+    print(f":robot: Stub OpenAI server on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Generate synthetic git repositories of a configurable size and shape for benchmarks.
+
+    python benchmarks/synth_repo.py /tmp/synth --files 2000 --depth 4 --languages py=5,js=3,go=1 --binary-ratio 0.05
+"""
+import argparse
+import os
+import random
+import subprocess
+from pathlib import Path
+
+# Function bodies per extension; {name} and {i} are filled in per generated function, the identifiers per file
+TEMPLATES = {
+    ".py": "def {name}({arg}, {limit}={i}):\n    \"\"\"Handle {name}.\"\"\"\n    for {var} in range({limit}):\n        if {arg}.get('id') == {var}:\n            return {{'status': '{state}', 'value': {var}}}\n    return None\n\n",
+    ".js": "export function {name}({arg}, {limit} = {i}) {{\n  for (let {var} = 0; {var} < {limit}; {var}++) {{\n    if ({arg}.id === {var}) return {{ status: '{state}', value: {var} }};\n  }}\n  return null;\n}}\n\n",
+    ".ts": "export function {name}({arg}: Request, {limit}: number = {i}): Result | null {{\n  for (let {var} = 0; {var} < {limit}; {var}++) {{\n    if ({arg}.id === {var}) return {{ status: '{state}', value: {var} }};\n  }}\n  return null;\n}}\n\n",
+    ".go": "func {name}({arg} Request, {limit} int) *Result {{\n\tfor {var} := 0; {var} < {limit}+{i}; {var}++ {{\n\t\tif {arg}.ID == {var} {{\n\t\t\treturn &Result{{Status: \"{state}\", Value: {var}}}\n\t\t}}\n\t}}\n\treturn nil\n}}\n\n",
+    ".java": "    public Result {name}(Request {arg}) {{\n        for (int {var} = 0; {var} < {i}; {var}++) {{\n            if ({arg}.getId() == {var}) return new Result(\"{state}\", {var});\n        }}\n        return null;\n    }}\n\n",
+    ".rs": "pub fn {name}({arg}: &Request) -> Option<Result> {{\n    for {var} in 0..{i} {{\n        if {arg}.id == {var} {{ return Some(Result::{state}({var})); }}\n    }}\n    None\n}}\n\n",
+    ".c": "int {name}(const {arg}_t *{arg}) {{\n    for (int {var} = 0; {var} < {i}; {var}++) {{\n        if ({arg}->id == {var}) return {var};\n    }}\n    return -1;\n}}\n\n",
+    ".md": "## {name}\n\nCall `{name}` with a {arg}; it retries up to {i} times before giving up.\n\n",
+}
+WORDS = ["load", "save", "parse", "render", "fetch", "update", "config", "user", "order", "cache", "token", "report"]
+# Identifier stems; drawing a fresh set per file keeps files from being near-duplicates of each other
+STEMS = ["item", "entry", "node", "payload", "event", "record", "query", "job", "task", "frame", "batch", "slot",
+         "message", "packet", "chunk", "row", "field", "key", "index", "count", "step", "tries", "state", "result"]
+
+
+def parse_mix(text: str) -> dict:
+    """
+    "py=5,js=3" -> {".py": 5.0, ".js": 3.0}
+    """
+    mix = {}
+    for part in text.split(","):
+        ext, _, weight = part.strip().partition("=")
+        ext = "." + ext.lstrip(".")
+        if ext not in TEMPLATES:
+            raise ValueError(f"Unsupported language {ext}, choose from {', '.join(TEMPLATES)}")
+        mix[ext] = float(weight or 1)
+    return mix
+
+
+def _git(*args, cwd: Path) -> None:
+    env = {**os.environ, "GIT_AUTHOR_NAME": "bench", "GIT_AUTHOR_EMAIL": "bench@example.com",
+           "GIT_COMMITTER_NAME": "bench", "GIT_COMMITTER_EMAIL": "bench@example.com",
+           "GIT_AUTHOR_DATE": "2024-01-01T00:00:00Z", "GIT_COMMITTER_DATE": "2024-01-01T00:00:00Z"}
+    subprocess.run(["git", *args], cwd=cwd, env=env, check=True, capture_output=True)
+
+
+def make_repo(root: str, files: int = 500, depth: int = 3, min_kb: float = 1, max_kb: float = 16,
+              languages: dict = None, binary_ratio: float = 0.02, commits: int = 1, seed: int = 0) -> dict:
+    """
+    Write a deterministic repository under `root` and commit it. Files are spread over
+    `depth` directory levels, sized uniformly between min_kb and max_kb, with the given
+    language weights and a share of binary noise. Returns a description of what was written.
+    """
+    rng = random.Random(seed)
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    _git("init", "--quiet", "--initial-branch=main", cwd=root)
+    languages = languages or {".py": 1.0}
+    extensions, weights = list(languages), list(languages.values())
+    stats = {"files": 0, "bytes": 0, "binary_files": 0, "languages": {}}
+
+    def write(path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        stats["files"] += 1
+        stats["bytes"] += len(data)
+
+    write(root / "README.md", b"# Synthetic repository\n\nInstall with `pip install -e .` and run `make test`.\n")
+    per_commit = max(1, files // commits)
+    for i in range(files):
+        parts = [f"{rng.choice(WORDS)}{rng.randint(0, 9)}" for _ in range(rng.randint(1, depth))] if depth else []
+        size = int(rng.uniform(min_kb, max_kb) * 1024)
+        if rng.random() < binary_ratio:
+            write(root.joinpath(*parts, f"asset{i}.bin"), rng.randbytes(size))
+            stats["binary_files"] += 1
+        else:
+            ext = rng.choices(extensions, weights)[0]
+            chunks, length, n = [], 0, 0
+            arg, var, limit, state = (f"{stem}_{rng.choice(WORDS)}" for stem in rng.sample(STEMS, 4))
+            while length < size:
+                chunk = TEMPLATES[ext].format(name=f"{rng.choice(WORDS)}_{i}_{n}", i=n % 7 + 1, arg=arg, var=var,
+                                              limit=limit, state=state)
+                chunks.append(chunk)
+                length += len(chunk)
+                n += 1
+            write(root.joinpath(*parts, f"{rng.choice(WORDS)}_{i}{ext}"), "".join(chunks).encode("utf-8"))
+            stats["languages"][ext] = stats["languages"].get(ext, 0) + 1
+        if (i + 1) % per_commit == 0 or i == files - 1:
+            _git("add", "-A", cwd=root)
+            _git("commit", "--quiet", "--allow-empty", "-m", f"Add files up to {i + 1}", cwd=root)
+    return {"path": str(root), **stats}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("root", help="directory to create the repository in")
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--depth", type=int, default=3, help="maximum directory nesting")
+    parser.add_argument("--min-kb", type=float, default=1)
+    parser.add_argument("--max-kb", type=float, default=16)
+    parser.add_argument("--languages", default="py=5,js=2,ts=2,go=1,md=1", help="extension=weight list")
+    parser.add_argument("--binary-ratio", type=float, default=0.02, help="share of random binary files")
+    parser.add_argument("--commits", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    info = make_repo(args.root, args.files, args.depth, args.min_kb, args.max_kb, parse_mix(args.languages),
+                     args.binary_ratio, args.commits, args.seed)
+    print(f":white_check_mark: {info['files']} files, {info['bytes'] / 1e6:.1f} MB in {info['path']}")
+
+
+if __name__ == "__main__":
+    main()
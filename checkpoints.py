@@ -0,0 +1,185 @@
+import hashlib
+import json
+import pickle
+import re
+import threading
+from langgraph.checkpoint.memory import InMemorySaver
+from tools import CACHE_DIR, atomic_write
+
+CHECKPOINT_DIR = CACHE_DIR / "checkpoints"
+
+_checkpointer = None
+_checkpointer_lock = threading.Lock()
+
+class DiskCheckpointSaver(InMemorySaver):
+    """
+    langgraph-checkpoint's InMemorySaver persisted to one pickle file per thread (run ID),
+    rewritten after every checkpoint so a crashed run can be resumed by a new process.
+    Threads are loaded from disk the first time they are used.
+    """
+    def __init__(self, directory=CHECKPOINT_DIR, **kwargs):
+        super().__init__(**kwargs)
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._loaded = set()
+        self._lock = threading.RLock()
+
+    def _path(self, thread_id: str):
+        name = re.sub(r"[^A-Za-z0-9_.-]+", "-", thread_id)
+        digest = hashlib.sha1(thread_id.encode("utf-8")).hexdigest()[:8]
+        return self.directory / f"{name}-{digest}.pkl"
+
+    def _load(self, thread_id: str) -> None:
+        if thread_id in self._loaded:
+            return
+        self._loaded.add(thread_id)
+        try:
+            with open(self._path(thread_id), "rb") as f:
+                data = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return
+        self.storage[thread_id].update(data["storage"])
+        self.writes.update(data["writes"])
+        self.blobs.update(data["blobs"])
+
+    def _save(self, thread_id: str) -> None:
+        data = {
+            "storage": dict(self.storage[thread_id]),
+            "writes": {key: value for key, value in self.writes.items() if key[0] == thread_id},
+            "blobs": {key: value for key, value in self.blobs.items() if key[0] == thread_id},
+        }
+        atomic_write(self._path(thread_id), pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def get_tuple(self, config):
+        with self._lock:
+            self._load(config["configurable"]["thread_id"])
+            return super().get_tuple(config)
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        with self._lock:
+            if config:
+                self._load(config["configurable"]["thread_id"])
+            # Materialized under the lock; histories of a run are short
+            return iter(list(super().list(config, filter=filter, before=before, limit=limit)))
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            self._load(thread_id)
+            result = super().put(config, checkpoint, metadata, new_versions)
+            self._save(thread_id)
+        return result
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            self._load(thread_id)
+            super().put_writes(config, writes, task_id, task_path)
+            self._save(thread_id)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            super().delete_thread(thread_id)
+            for key in [key for key in self.blobs if key[0] == thread_id]:
+                del self.blobs[key]
+            self._loaded.discard(thread_id)
+            self._path(thread_id).unlink(missing_ok=True)
+
+def get_checkpointer() -> DiskCheckpointSaver:
+    """
+    Process-wide checkpointer under .repo_cache/checkpoints.
+    """
+    global _checkpointer
+    with _checkpointer_lock:
+        if _checkpointer is None:
+            _checkpointer = DiskCheckpointSaver()
+        return _checkpointer
+
+def fingerprint(values: dict, fields: list) -> str:
+    """
+    Hash of the state fields a node reads.
+    """
+    picked = {}
+    for field in fields:
+        value = values.get(field)
+        picked[field] = value.model_dump() if hasattr(value, "model_dump") else value
+    return hashlib.sha256(json.dumps(picked, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def resume_point(snapshot, history: list, inputs: dict, node_inputs: dict, run_inputs: set):
+    """
+    Decide how to (re)start a run from its saved checkpoints. Returns (action, snapshot, node):
+    "fresh" (no usable checkpoint, or a finished run: its report may predate new upstream
+    commits, and the caches make a rerun cheap), "resume" (continue after the last successful
+    node) or "rewind" (re-run from `node`, the first node whose input fingerprint changed,
+    forking from the checkpoint taken just before it ran).
+    `node_inputs` maps nodes, in graph order, to the state fields they read; only the
+    explicitly given `run_inputs` fields of `inputs` count as changes.
+    """
+    if snapshot is None or not snapshot.values or not snapshot.next:
+        return "fresh", None, None
+    overrides = {key: value for key, value in inputs.items() if key in run_inputs and value not in ("", None)}
+    # Latest checkpoint taken right before each node ran (history is newest first)
+    before = {}
+    for snap in history:
+        for node in snap.next:
+            before.setdefault(node, snap)
+    for node, fields in node_inputs.items():
+        snap = before.get(node)
+        if snap is None:
+            break
+        if fingerprint(snap.values, fields) != fingerprint({**snap.values, **overrides}, fields):
+            return "rewind", snap, node
+    return "resume", snapshot, None
+
+def _prepare(graph, inputs: dict, run_id: str, node_inputs: dict, run_inputs: set, fresh: bool = False):
+    """
+    Pick up a run where its checkpoints left it. Returns (payload, config, action) to pass to
+    invoke/ainvoke, with payload None when the run continues from a checkpoint.
+    """
+    config = {"configurable": {"thread_id": run_id}}
+    inputs = {**inputs, "run_id": run_id}
+    checkpointer = graph.checkpointer
+    snapshot = None if fresh else graph.get_state(config)
+    if snapshot is not None and snapshot.values:
+        artifacts = inputs.get("artifacts") or snapshot.values.get("artifacts")
+        backend = artifacts.get("backend") if isinstance(artifacts, dict) else getattr(artifacts, "backend", "")
+        if backend == "memory":
+            # The artifacts of the earlier attempt died with its process
+            print(f":warning: Run {run_id} kept its artifacts in memory, starting over")
+            snapshot = None
+    history = list(graph.get_state_history(config)) if snapshot is not None else []
+    action, snap, node = resume_point(snapshot, history, inputs, node_inputs, run_inputs)
+    if action == "rewind":
+        order = list(node_inputs)
+        position = order.index(node)
+        if position == 0:
+            action = "fresh"
+        else:
+            overrides = {key: value for key, value in inputs.items()
+                         if key in run_inputs and value not in ("", None)}
+            print(f":leftwards_arrow_with_hook: Run {run_id}: inputs of {node} changed, re-running from there")
+            config = graph.update_state(snap.config, overrides, as_node=order[position - 1])
+            return None, config, action
+    if action == "fresh":
+        checkpointer.delete_thread(run_id)
+        return inputs, config, action
+    print(f":repeat: Run {run_id}: resuming at {', '.join(snapshot.next)}")
+    return None, config, action
+
+def run_resumable(graph, inputs: dict, run_id: str, node_inputs: dict, run_inputs: set, fresh: bool = False) -> dict:
+    """
+    Invoke a graph compiled with a checkpointer under `run_id`: a new run starts from the
+    inputs, a failed one resumes after its last successful node, and a rerun whose inputs
+    changed re-runs from the first node reading a changed field (see resume_point). A run
+    that finished starts over.
+    """
+    payload, config, action = _prepare(graph, inputs, run_id, node_inputs, run_inputs, fresh)
+    return graph.invoke(payload, config)
+
+async def arun_resumable(graph, inputs: dict, run_id: str, node_inputs: dict, run_inputs: set,
+                         fresh: bool = False) -> dict:
+    """
+    run_resumable() for graphs driven with `ainvoke`.
+    """
+    payload, config, action = _prepare(graph, inputs, run_id, node_inputs, run_inputs, fresh)
+    return await graph.ainvoke(payload, config)
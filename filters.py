@@ -0,0 +1,316 @@
+import fnmatch
+import hashlib
+import math
+import re
+from collections import Counter
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+# Directories of third-party code, build outputs and tool caches, pruned before descending
+VENDOR_DIRS = {
+    ".git", ".hg", ".svn", "node_modules", "bower_components", "jspm_packages", "vendor", "vendors",
+    "third_party", "third-party", "thirdparty", "dist", "build", "out", "target", "obj", ".next", ".nuxt",
+    ".svelte-kit", ".output", ".angular", ".parcel-cache", ".turbo", "coverage", "htmlcov", ".nyc_output",
+    "__pycache__", ".venv", "venv", ".tox", ".nox", ".eggs", ".mypy_cache", ".pytest_cache", ".ruff_cache",
+    "site-packages", "Pods", "Carthage", ".gradle", ".idea", ".vscode", ".terraform", ".cache",
+}
+VENDOR_DIR_PATTERNS = ["*.egg-info"]
+# Generated files recognizable by name (matched case-insensitively)
+GENERATED_PATTERNS = [
+    "*.min.js", "*.min.css", "*-min.js", "*.bundle.js", "*.chunk.js", "*.prod.js", "*.umd.js", "*_pb2.py",
+    "*_pb2_grpc.py", "*.pb.go", "*.pb.gw.go", "*.pb.cc", "*.pb.h", "*_grpc.pb.go", "*.generated.*", "*.g.cs",
+    "*.designer.cs", "*.g.dart", "*.freezed.dart", "*_generated.go", "zz_generated*.go", "bindata.go",
+]
+# Markers of generated code in the first lines of a file
+GENERATED_HEADER = re.compile(
+    r"@generated\b|code generated\b.{0,80}\bdo not edit|\bauto-?generated\b|\bautomatically generated\b|"
+    r"\bthis file (?:is|was|has been) generated\b|do not (?:edit|modify)\b.{0,40}\b(?:generated|automatically)",
+    re.IGNORECASE)
+HEADER_CHARS = 1024
+# Minified: very long lines on average, or one line holding most of the file
+MINIFIED_MIN_BYTES = 1024
+MINIFIED_AVG_LINE = 250
+MINIFIED_MAX_LINE = 5000
+# Embedded data (base64, packed tables): byte entropy in bits and share of whitespace
+ENTROPY_MIN_BYTES = 4096
+ENTROPY_SAMPLE_BYTES = 64 * 1024
+ENTROPY_BITS = 5.6
+ENTROPY_MAX_WHITESPACE = 0.04
+# Duplicates: files smaller than this are never compared (empty __init__.py and the like)
+DUPLICATE_MIN_BYTES = 64
+NEAR_DUPLICATE_MIN_BYTES = 1024
+NEAR_DUPLICATE_BITS = 3
+SIMHASH_BANDS = 4
+SIMHASH_SAMPLE_CHARS = 64 * 1024
+
+RULES = ("vendor_dir", "gitignore", "generated_name", "generated_header", "minified", "high_entropy",
+         "duplicate", "near_duplicate")
+TOKEN = re.compile(r"\w+")
+
+def _hash64(data: bytes) -> int:
+    if xxhash is not None:
+        return xxhash.xxh3_64_intdigest(data)
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+def simhash(text: str) -> int:
+    """
+    64-bit simhash over the word 3-shingles of the first SIMHASH_SAMPLE_CHARS; near-identical
+    texts differ in a few bits.
+    """
+    tokens = TOKEN.findall(text[:SIMHASH_SAMPLE_CHARS].lower())
+    shingles = Counter(" ".join(tokens[i:i + 3]) for i in range(max(len(tokens) - 2, 1)))
+    values = [_hash64(shingle.encode("utf-8")) for shingle in shingles]
+    try:
+        import numpy as np
+    except ImportError:
+        weights = [0] * 64
+        for value, count in zip(values, shingles.values()):
+            for bit in range(64):
+                weights[bit] += count if value >> bit & 1 else -count
+    else:
+        bits = (np.array(values, dtype=np.uint64)[:, None] >> np.arange(64, dtype=np.uint64)) & np.uint64(1)
+        counts = np.fromiter(shingles.values(), dtype=np.int64, count=len(shingles))
+        weights = (counts[:, None] * (2 * bits.astype(np.int64) - 1)).sum(axis=0).tolist()
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+def byte_entropy(data: bytes) -> float:
+    if not data:
+        return 0.0
+    counts = Counter(data)
+    total = len(data)
+    return -sum(n / total * math.log2(n / total) for n in counts.values())
+
+def _gitignore_regex(pattern: str) -> str:
+    out = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("/**", i) and i + 3 == len(pattern):
+            out.append("/.*")
+            break
+        if pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+            continue
+        if char == "*":
+            out.append("[^/]*")
+        elif char == "?":
+            out.append("[^/]")
+        elif char == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                out.append(re.escape(char))
+            else:
+                body = pattern[i + 1:end]
+                out.append("[" + ("^" + body[1:] if body.startswith("!") else body) + "]")
+                i = end
+        elif char == "\\" and i + 1 < len(pattern):
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(char))
+        i += 1
+    return "".join(out)
+
+class GitIgnore:
+    """
+    .gitignore rules of a tree, added directory by directory (parents first). Supports
+    negation, directory-only patterns, anchoring and `**`; later rules win, as in git.
+    """
+    def __init__(self):
+        self._rules = []
+
+    def add(self, base: str, text: str) -> None:
+        base = base.strip("/")
+        for line in text.splitlines():
+            line = line.rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            elif line.startswith("\\"):
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            anchored = "/" in line
+            regex = _gitignore_regex(line.lstrip("/"))
+            if not anchored:
+                regex = "(?:.*/)?" + regex
+            self._rules.append((base, re.compile(regex + r"\Z", re.DOTALL), negate, dir_only))
+
+    def __bool__(self) -> bool:
+        return bool(self._rules)
+
+    def ignored(self, rel_path: str, is_dir: bool = False) -> bool:
+        result = False
+        for base, regex, negate, dir_only in self._rules:
+            if base:
+                if not rel_path.startswith(base + "/"):
+                    continue
+                sub = rel_path[len(base) + 1:]
+            else:
+                sub = rel_path
+            if dir_only and not is_dir:
+                continue
+            if regex.match(sub):
+                result = not negate
+        return result
+
+class FileFilter:
+    """
+    Drops vendored, generated and duplicate files from an extraction, and counts the files
+    and bytes removed by each rule. Path rules (prune_dir, keep_path) run before a file is
+    read; content rules (keep_content, or filter() over (path, content, error) tuples) after.
+    Files for which `exempt(path)` is true (README, manifests...) skip the name, content and
+    duplicate rules, but not the vendor directories or .gitignore.
+    """
+    def __init__(self, exempt=None, gitignore: bool = True):
+        self.exempt = exempt or (lambda path: False)
+        self.gitignore = GitIgnore() if gitignore else None
+        self.stats = {rule: {"files": 0, "dirs": 0, "bytes": 0} for rule in RULES}
+        self.kept = {"files": 0, "bytes": 0}
+        self._dirs = {}
+        self._hashes = {}
+        self._bands = [{} for _ in range(SIMHASH_BANDS)]
+
+    def remove(self, rule: str, size: int = 0, is_dir: bool = False) -> str:
+        entry = self.stats[rule]
+        entry["dirs" if is_dir else "files"] += 1
+        entry["bytes"] += size
+        return rule
+
+    def add_gitignore(self, rel_dir: str, text: str) -> None:
+        if self.gitignore is not None:
+            self.gitignore.add(rel_dir.replace("\\", "/"), text)
+            self._dirs.clear()
+
+    def _dir_rule(self, rel_dir: str):
+        if rel_dir not in self._dirs:
+            name = rel_dir.rsplit("/", 1)[-1]
+            if name in VENDOR_DIRS or any(fnmatch.fnmatchcase(name, p) for p in VENDOR_DIR_PATTERNS):
+                self._dirs[rel_dir] = "vendor_dir"
+            elif self.gitignore and self.gitignore.ignored(rel_dir, is_dir=True):
+                self._dirs[rel_dir] = "gitignore"
+            else:
+                self._dirs[rel_dir] = None
+        return self._dirs[rel_dir]
+
+    def prune_dir(self, rel_dir: str, size=0) -> bool:
+        """
+        True when a directory should not be descended into (counted once per directory).
+        `size` may be a callable, called only for a pruned directory.
+        """
+        rule = self._dir_rule(rel_dir.replace("\\", "/"))
+        if rule:
+            self.remove(rule, size() if callable(size) else size, is_dir=True)
+        return rule is not None
+
+    def path_rule(self, rel_path: str):
+        """
+        Rule removing a file by its path alone (its directories included), or None.
+        """
+        rel_path = rel_path.replace("\\", "/")
+        parts = rel_path.split("/")
+        for depth in range(1, len(parts)):
+            rule = self._dir_rule("/".join(parts[:depth]))
+            if rule:
+                return rule
+        if self.gitignore and self.gitignore.ignored(rel_path):
+            return "gitignore"
+        name = parts[-1].lower()
+        if not self.exempt(rel_path) and any(fnmatch.fnmatchcase(name, p) for p in GENERATED_PATTERNS):
+            return "generated_name"
+        return None
+
+    def keep_path(self, rel_path: str, size: int = 0) -> bool:
+        rule = self.path_rule(rel_path)
+        if rule:
+            self.remove(rule, size)
+        return rule is None
+
+    def content_rule(self, rel_path: str, content: str):
+        """
+        Rule removing a file by its content, or None. Duplicates are judged against the
+        files kept so far, so the first copy in walk order is the one kept.
+        """
+        if self.exempt(rel_path):
+            return None
+        data = content.encode("utf-8", errors="ignore")
+        if GENERATED_HEADER.search(content[:HEADER_CHARS]):
+            return "generated_header"
+        if len(data) >= MINIFIED_MIN_BYTES:
+            lengths = [len(line) for line in content.split("\n")]
+            if sum(lengths) / len(lengths) > MINIFIED_AVG_LINE or max(lengths) > MINIFIED_MAX_LINE:
+                return "minified"
+        if len(data) >= ENTROPY_MIN_BYTES:
+            sample = data[:ENTROPY_SAMPLE_BYTES]
+            whitespace = sum(sample.count(c) for c in b" \t\n") / len(sample)
+            if whitespace < ENTROPY_MAX_WHITESPACE and byte_entropy(sample) > ENTROPY_BITS:
+                return "high_entropy"
+        if len(data) < DUPLICATE_MIN_BYTES:
+            return None
+        digest = _hash64(data)
+        if digest in self._hashes:
+            return "duplicate"
+        self._hashes[digest] = rel_path
+        if len(data) >= NEAR_DUPLICATE_MIN_BYTES:
+            fingerprint = simhash(content)
+            width = 64 // SIMHASH_BANDS
+            keys = [fingerprint >> (band * width) & ((1 << width) - 1) for band in range(SIMHASH_BANDS)]
+            # Within NEAR_DUPLICATE_BITS < SIMHASH_BANDS bits, two hashes share at least one band
+            for band, key in enumerate(keys):
+                for other in self._bands[band].get(key, ()):
+                    if bin(fingerprint ^ other).count("1") <= NEAR_DUPLICATE_BITS:
+                        return "near_duplicate"
+            for band, key in enumerate(keys):
+                self._bands[band].setdefault(key, []).append(fingerprint)
+        return None
+
+    def keep_content(self, rel_path: str, content: str) -> bool:
+        rule = self.content_rule(rel_path, content)
+        size = len(content.encode("utf-8", errors="ignore"))
+        if rule:
+            self.remove(rule, size)
+        else:
+            self.kept["files"] += 1
+            self.kept["bytes"] += size
+        return rule is None
+
+    def filter(self, files):
+        """
+        Pass through the (relative_path, content, error) tuples that survive the content rules.
+        """
+        for rel_path, content, error in files:
+            if error is not None or self.keep_content(rel_path, content):
+                yield rel_path, content, error
+
+    def report(self) -> dict:
+        rules = {rule: dict(entry) for rule, entry in self.stats.items() if entry["files"] or entry["dirs"]}
+        return {
+            "rules": rules,
+            "removed_files": sum(entry["files"] for entry in rules.values()),
+            "removed_dirs": sum(entry["dirs"] for entry in rules.values()),
+            "removed_bytes": sum(entry["bytes"] for entry in rules.values()),
+            "kept_files": self.kept["files"],
+            "kept_bytes": self.kept["bytes"],
+        }
+
+def format_report(report: dict) -> str:
+    def size(n):
+        return f"{n / 1024 / 1024:.1f} MB" if n >= 1024 * 1024 else f"{n / 1024:.1f} KB"
+    rules = ", ".join(
+        rule + (f" {size(entry['bytes'])}" if entry["bytes"] else "") + (f" ({entry['dirs']} dirs)" if entry["dirs"] else "")
+        for rule, entry in sorted(report["rules"].items(), key=lambda item: -item[1]["bytes"])
+    )
+    return (f":broom: Filtered {report['removed_files']} files, {size(report['removed_bytes'])}"
+            f"{': ' + rules if rules else ''}; kept {report['kept_files']} files, {size(report['kept_bytes'])}")
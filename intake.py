@@ -0,0 +1,139 @@
+import os
+import re
+from tools import normalize_repo_url
+
+# Below this confidence the model is asked to fill in the uncertain fields
+MIN_CONFIDENCE = float(os.getenv("INTAKE_MIN_CONFIDENCE", "0.6"))
+
+REPO_HOSTS = r"(?:github\.com|gitlab\.com|bitbucket\.org|codeberg\.org|gitlab\.[\w.-]+)"
+REPO_URL = re.compile(
+    r"(?:https?://(?:www\.)?|ssh://git@|git@)?"
+    rf"(?P<host>{REPO_HOSTS})[:/]"
+    r"(?P<path>[\w.-]+(?:/[\w.-]+)+)",
+    re.IGNORECASE)
+# Path segments after the repository part of a web URL
+URL_SUFFIXES = ("-", "tree", "blob", "issues", "pulls", "pull", "merge_requests", "wiki", "releases", "commit",
+                "commits", "actions", "src", "raw")
+
+ROLE_KEYWORDS = {
+    "developer": ("developer", "software engineer", "engineer", "programmer", "dev", "contributor", "maintainer",
+                  "devops", "sre", "backend", "frontend", "full-stack", "fullstack"),
+    "business_analyst": ("business analyst", "analyst", "ba", "business stakeholder", "business user"),
+    "product_manager": ("product manager", "product owner", "product lead", "pm", "po", "program manager"),
+    "technical_writer": ("technical writer", "tech writer", "documentation writer", "docs writer",
+                         "documentation author", "writer"),
+}
+ROLE_INTRO = r"(?:i'?m|i am|as|acting as|working as|for)\s+(?:an?\s+|the\s+|our\s+)?"
+# Canonical topics and the words that give them away (first match wins)
+TOPIC_KEYWORDS = [
+    ("installation and setup", ("install", "setup", "set up", "getting started", "run locally", "running locally",
+                                "dependencies", "environment setup", "configuration")),
+    ("deployment", ("deploy", "deployment", "production", "hosting", "kubernetes", "helm")),
+    ("architecture overview", ("architecture", "design", "structure", "components", "modules", "overview")),
+    ("API reference", ("api", "endpoint", "endpoints", "sdk", "interface")),
+    ("testing", ("test", "tests", "testing", "coverage", "ci")),
+    ("security", ("security", "authentication", "authorization", "vulnerab", "secrets")),
+    ("contributing guide", ("contribut", "pull request", "code style", "guidelines")),
+    ("features and functionality", ("feature", "functionality", "capabilities", "what it does", "what does")),
+]
+# "a report focused on X", "topic: X", "about X"...
+TOPIC_PHRASE = re.compile(
+    r"(?:topic(?: of the (?:final )?report)?\s*(?:is|:)|focus(?:ed|ing)? on|report (?:on|about)|"
+    r"summary (?:of|on|about)|summari[sz]e|interested in|explain(?:ing)?|understand(?:ing)?(?: how)?|about)"
+    r"\s+(?:the\s+)?(?P<topic>[^.,;:?!\n]{3,120}?)(?=\s+(?:of|for|in|from|at)\s|[.,;:?!\n]|$)",
+    re.IGNORECASE)
+
+def find_repo_url(text: str):
+    """
+    First repository URL of a text, normalized to https://host/owner/repo, with a confidence
+    (lower when several different repositories are mentioned).
+    """
+    urls = []
+    for match in REPO_URL.finditer(text):
+        segments = match.group("path").rstrip(".").split("/")
+        # GitLab allows nested groups; everything up to a web route is the project path
+        for i, segment in enumerate(segments[2:], start=2):
+            if segment in URL_SUFFIXES:
+                segments = segments[:i]
+                break
+        if not match.group("host").lower().startswith("gitlab"):
+            segments = segments[:2]
+        url = normalize_repo_url(f"https://{match.group('host')}/{'/'.join(segments)}")
+        if url not in urls:
+            urls.append(url)
+    if not urls:
+        return "", 0.0
+    return urls[0], 1.0 if len(urls) == 1 else 0.5
+
+def _mentions(text: str, keyword: str) -> bool:
+    # Keywords of 5+ characters also match as word stems ("install" in "installation")
+    end = "" if len(keyword) >= 5 else r"(?![\w-])"
+    return re.search(rf"(?<![\w-]){re.escape(keyword)}{end}", text) is not None
+
+def find_role(text: str):
+    """
+    The UserInput role a text describes its reader as, with a confidence. "I'm a product
+    manager" scores higher than a passing mention; no mention means developer at low confidence.
+    """
+    lowered = text.lower()
+    best = ("developer", 0.3, -1)
+    for role, keywords in ROLE_KEYWORDS.items():
+        for keyword in keywords:
+            if re.search(rf"{ROLE_INTRO}{re.escape(keyword)}(?![\w-])", lowered):
+                score = 0.95
+            elif len(keyword) > 3 and _mentions(lowered, keyword):
+                score = 0.7
+            else:
+                continue
+            # Longer keywords are more specific ("product manager" over "manager")
+            if (score, len(keyword)) > (best[1], best[2]):
+                best = (role, score, len(keyword))
+    return best[0], best[1]
+
+def find_topic(text: str):
+    """
+    Topic of the report with a confidence: a canonical topic when its keywords show up in an
+    explicit "focused on ..." phrase or in the text, else the phrase itself.
+    """
+    lowered = text.lower()
+    phrases = [m.group("topic").strip() for m in TOPIC_PHRASE.finditer(text)]
+    phrases = [p for p in phrases if not REPO_URL.search(p)]
+    for phrase in phrases:
+        for topic, keywords in TOPIC_KEYWORDS:
+            if any(_mentions(phrase.lower(), k) for k in keywords):
+                return topic, 0.9
+    counts = []
+    for topic, keywords in TOPIC_KEYWORDS:
+        hits = sum(_mentions(lowered, k) for k in keywords)
+        if hits:
+            counts.append((hits, topic))
+    if counts:
+        hits, topic = max(counts, key=lambda c: c[0])
+        return topic, 0.8 if hits > 1 else 0.65
+    if phrases:
+        return phrases[0], 0.6
+    return "", 0.0
+
+def parse_request(text: str) -> dict:
+    """
+    Extract repo_url, type_of_user and topic from a free-text request without calling a
+    model. Returns the fields, a confidence per field and the overall confidence (the lowest).
+    """
+    repo_url, repo_confidence = find_repo_url(text)
+    type_of_user, role_confidence = find_role(text)
+    topic, topic_confidence = find_topic(text)
+    scores = {"repo_url": repo_confidence, "type_of_user": role_confidence, "topic": topic_confidence}
+    return {
+        "fields": {"repo_url": repo_url, "type_of_user": type_of_user, "topic": topic},
+        "scores": scores,
+        "confidence": min(scores.values()),
+    }
+
+def normalize_role(value: str) -> str:
+    """
+    Map a free-form role (e.g. from the model's reply) onto a UserInput role.
+    """
+    value = (value or "").strip().lower().replace("-", " ")
+    if value.replace(" ", "_") in ROLE_KEYWORDS:
+        return value.replace(" ", "_")
+    return find_role(f"I am a {value}")[0]
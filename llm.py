@@ -0,0 +1,235 @@
+import asyncio
+import contextvars
+import hashlib
+import json
+import os
+import threading
+import time
+import weakref
+from profiling import record_llm_call
+from scheduler import PRIORITY_NORMAL, get_scheduler
+from tools import CACHE_DIR
+
+# On-disk response cache shared by every OpenAI call of the pipeline
+LLM_CACHE_DIR = CACHE_DIR / "llm"
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_BYTES = int(os.getenv("LLM_CACHE_BYTES", str(512 * 1024 * 1024)))
+# Pool and timeouts of the HTTP clients (httpx and openai are imported with the first client)
+HTTP_LIMITS = {"max_connections": 64, "max_keepalive_connections": 16}
+HTTP_TIMEOUT = {"timeout": 600.0, "connect": 10.0}
+# Completion tokens assumed per call when budgeting tokens-per-minute
+OUTPUT_ESTIMATE = 1024
+
+_client = None
+_client_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
+_loop = None
+_loop_lock = threading.Lock()
+_cache = None
+_cache_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+_encodings = {}
+_encodings_lock = threading.Lock()
+
+def _encoding(model: str):
+    with _encodings_lock:
+        return _load_encoding(model)
+
+def _load_encoding(model: str):
+    if model not in _encodings:
+        try:
+            import tiktoken
+        except ImportError:
+            _encodings[model] = None
+            return None
+        try:
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encodings[model] = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            # BPE files are downloaded on first use; estimate when offline
+            print(f":warning: tiktoken unavailable ({e.__class__.__name__}), estimating token counts")
+            _encodings[model] = None
+    return _encodings[model]
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    """
+    Count tokens with tiktoken, or estimate 4 characters per token when it is unavailable.
+    """
+    encoding = _encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+def estimate_tokens(messages: list, model: str = "gpt-4o") -> int:
+    return sum(count_tokens(m.get("content") or "", model) for m in messages) + OUTPUT_ESTIMATE
+
+def get_client():
+    """
+    Process-wide OpenAI client backed by one pooled HTTP client.
+    Retries are left to the scheduler.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            import httpx
+            from openai import OpenAI
+            _client = OpenAI(http_client=httpx.Client(limits=httpx.Limits(**HTTP_LIMITS),
+                                                      timeout=httpx.Timeout(**HTTP_TIMEOUT)), max_retries=0)
+        return _client
+
+def get_async_client():
+    """
+    AsyncOpenAI client pooled per event loop (httpx async connections cannot cross loops).
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        import httpx
+        from openai import AsyncOpenAI
+        client = AsyncOpenAI(http_client=httpx.AsyncClient(limits=httpx.Limits(**HTTP_LIMITS),
+                                                           timeout=httpx.Timeout(**HTTP_TIMEOUT)), max_retries=0)
+        _async_clients[loop] = client
+    return client
+
+def _llm_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="llm-loop", daemon=True).start()
+            _loop = loop
+        return _loop
+
+def run_coroutine(coro):
+    """
+    Run a coroutine on the process-wide LLM event loop and wait for its result. Blocking
+    nodes use this instead of asyncio.run(), whose throwaway loop would get (and leak) a
+    new AsyncOpenAI connection pool on every call.
+    """
+    loop = _llm_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        raise RuntimeError("run_coroutine() cannot wait on the LLM event loop from inside it")
+    context = contextvars.copy_context()
+
+    async def in_caller_context():
+        # Carry the caller's context variables over (e.g. the node LLM calls are profiled under)
+        for var, value in context.items():
+            var.set(value)
+        return await coro
+    future = asyncio.run_coroutine_threadsafe(in_caller_context(), loop)
+    try:
+        return future.result()
+    except BaseException:
+        future.cancel()
+        raise
+
+async def _open_async_client():
+    return get_async_client()
+
+def open_clients() -> None:
+    """
+    Create the OpenAI client and the AsyncOpenAI client of the LLM event loop (the one the
+    nodes' map-reduce calls run on) ahead of the first call.
+    """
+    get_client()
+    run_coroutine(_open_async_client())
+
+def get_cache():
+    """
+    Response cache with TTL and size-bounded LRU eviction, or None without diskcache.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            try:
+                from diskcache import Cache
+            except ImportError:
+                return None
+            _cache = Cache(str(LLM_CACHE_DIR), size_limit=LLM_CACHE_BYTES,
+                           eviction_policy="least-recently-used")
+        return _cache
+
+def cache_key(model: str, messages: list, temperature: float, **kwargs) -> str:
+    payload = {"model": model, "messages": messages, "temperature": temperature, **kwargs}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def cache_stats() -> dict:
+    """
+    Hit/miss counters of this process plus the current on-disk cache size.
+    """
+    cache = get_cache()
+    total = _stats["hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "hit_rate": _stats["hits"] / total if total else 0.0,
+        "entries": len(cache) if cache is not None else 0,
+        "bytes": cache.volume() if cache is not None else 0
+    }
+
+def _lookup(key: str):
+    cache = get_cache()
+    content = cache.get(key) if cache is not None else None
+    _stats["hits" if content is not None else "misses"] += 1
+    return content
+
+def _store(key: str, content: str) -> None:
+    cache = get_cache()
+    if cache is not None and content:
+        cache.set(key, content, expire=LLM_CACHE_TTL)
+
+def _record(model: str, response, start: float) -> None:
+    usage = getattr(response, "usage", None)
+    record_llm_call(model, getattr(usage, "prompt_tokens", 0), getattr(usage, "completion_tokens", 0),
+                    time.perf_counter() - start)
+
+def chat(messages: list, model: str = "gpt-4o", temperature: float = 0.3, use_cache: bool = True,
+         priority: int = PRIORITY_NORMAL, **kwargs) -> str:
+    """
+    Chat completion through the shared client; identical requests are served from the cache,
+    everything else goes through the rate-limit-aware scheduler.
+    """
+    key = cache_key(model, messages, temperature, **kwargs)
+    start = time.perf_counter()
+    if use_cache:
+        content = _lookup(key)
+        if content is not None:
+            record_llm_call(model, 0, 0, time.perf_counter() - start, cached=True)
+            return content
+    response = get_scheduler().run(
+        lambda: get_client().chat.completions.create(model=model, messages=messages, temperature=temperature, **kwargs),
+        tokens=estimate_tokens(messages, model),
+        priority=priority
+    )
+    _record(model, response, start)
+    content = response.choices[0].message.content or ""
+    _store(key, content)
+    return content
+
+async def achat(messages: list, model: str = "gpt-4o", temperature: float = 0.3, use_cache: bool = True,
+                priority: int = PRIORITY_NORMAL, **kwargs) -> str:
+    """
+    Async variant of chat, for concurrent map-reduce calls.
+    """
+    key = cache_key(model, messages, temperature, **kwargs)
+    start = time.perf_counter()
+    if use_cache:
+        content = _lookup(key)
+        if content is not None:
+            record_llm_call(model, 0, 0, time.perf_counter() - start, cached=True)
+            return content
+    response = await get_scheduler().run_async(
+        lambda: get_async_client().chat.completions.create(
+            model=model, messages=messages, temperature=temperature, **kwargs
+        ),
+        tokens=estimate_tokens(messages, model),
+        priority=priority
+    )
+    _record(model, response, start)
+    content = response.choices[0].message.content or ""
+    _store(key, content)
+    return content
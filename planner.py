@@ -0,0 +1,179 @@
+import fnmatch
+import os
+from pathlib import PurePosixPath
+from llm import count_tokens
+from retrieval import RETRIEVAL_TOKEN_BUDGET, tokenize
+from summarizer import split_section
+from tools import SUPPORTED_EXTENSIONS
+
+ROLES = ("request", "manifest", "build", "container", "ci", "config", "docs", "source", "tests", "other")
+# Priority of each role per kind of topic (0 = never sent)
+PROFILES = {
+    "setup": {"request": 10, "manifest": 10, "container": 9, "build": 9, "config": 8, "docs": 8, "ci": 7,
+              "source": 3, "other": 2, "tests": 1},
+    "architecture": {"request": 10, "docs": 9, "manifest": 7, "source": 6, "container": 5, "build": 4,
+                     "config": 4, "ci": 3, "tests": 2, "other": 1},
+    "general": {"request": 10, "docs": 8, "manifest": 6, "source": 6, "build": 4, "container": 4, "config": 4,
+                "ci": 3, "tests": 3, "other": 1},
+}
+PROFILE_KEYWORDS = {
+    "setup": ("install", "setup", "set up", "getting started", "deploy", "configur", "environment", "docker",
+              "build", "dependenc", "run locally", "requirement"),
+    "architecture": ("architecture", "overview", "design", "structure", "module", "component"),
+}
+# Adjustments per audience
+USER_BIAS = {
+    "developer": {"source": 2, "tests": 1},
+    "business_analyst": {"docs": 2, "source": -2, "tests": -3},
+    "product_manager": {"docs": 2, "source": -2, "tests": -3},
+    "technical_writer": {"docs": 3, "tests": -1},
+}
+# Roles at or above this priority are packed first, before relevance ranking
+PIN_PRIORITY = 7
+# Share of the budget the pinned files may use, and the most any single pinned file gets
+PIN_SHARE = float(os.getenv("PLANNER_PIN_SHARE", "0.5"))
+MAX_PINNED_FILE_TOKENS = 3000
+
+CONTAINER_NAMES = {"dockerfile", "containerfile", "docker-compose.yml", "docker-compose.yaml", "compose.yml",
+                   "compose.yaml", "vagrantfile", "procfile"}
+CI_NAMES = {".gitlab-ci.yml", ".travis.yml", "azure-pipelines.yml", "bitbucket-pipelines.yml", "jenkinsfile"}
+MANIFEST_NAMES = {"pyproject.toml", "pipfile", "environment.yml", "package.json", "go.mod", "cargo.toml",
+                  "pom.xml", "gemfile", "composer.json", "build.gradle", "build.gradle.kts", "settings.gradle"}
+BUILD_NAMES = {"makefile", "gnumakefile", "cmakelists.txt", "justfile", "setup.py", "noxfile.py", "install.sh",
+               "setup.sh"}
+CONFIG_NAMES = {"setup.cfg", "tox.ini", "tsconfig.json", ".nvmrc", ".python-version", ".tool-versions",
+                "mkdocs.yml"}
+TEST_DIRS = {"test", "tests", "__tests__", "spec", "specs", "testing", "e2e"}
+TEST_SUFFIXES = ("_test.py", "_test.go", ".test.js", ".test.ts", ".spec.js", ".spec.ts", "test.java",
+                 "tests.cs", "_spec.rb", "_test.rs")
+
+def classify(path: str) -> str:
+    """
+    Role of a file in the repository, from its path alone.
+    """
+    rel = path.replace("\\", "/").lower()
+    name = rel.rsplit("/", 1)[-1]
+    parts = rel.split("/")
+    if name == "outputs.json":
+        return "request"
+    if name in CONTAINER_NAMES or name.startswith(("dockerfile.", "docker-compose.")) or name.endswith(".dockerfile"):
+        return "container"
+    if name in CI_NAMES or rel.startswith((".github/workflows/", ".circleci/")):
+        return "ci"
+    if name in MANIFEST_NAMES or fnmatch.fnmatchcase(name, "requirements*.txt"):
+        return "manifest"
+    if name in BUILD_NAMES:
+        return "build"
+    if name in CONFIG_NAMES or name.startswith(".env"):
+        return "config"
+    if TEST_DIRS.intersection(parts[:-1]) or name.startswith("test_") or name.endswith(TEST_SUFFIXES):
+        return "tests"
+    if name.endswith((".md", ".rst", ".txt")) or parts[0] in ("docs", "doc"):
+        return "docs"
+    if PurePosixPath(name).suffix in SUPPORTED_EXTENSIONS:
+        return "source"
+    return "other"
+
+def profile_for_topic(topic: str) -> str:
+    topic = (topic or "").lower()
+    for profile, keywords in PROFILE_KEYWORDS.items():
+        if any(keyword in topic for keyword in keywords):
+            return profile
+    return "general"
+
+def role_priorities(topic: str, type_of_user: str = "") -> dict:
+    weights = dict(PROFILES[profile_for_topic(topic)])
+    for role, bias in USER_BIAS.get(type_of_user, {}).items():
+        weights[role] = max(0, weights[role] + bias)
+    return weights
+
+def plan_budget(sections: list, topic: str, type_of_user: str = "", token_budget: int = RETRIEVAL_TOKEN_BUDGET,
+                model: str = "gpt-4o") -> dict:
+    """
+    Split (name, text) sections for a token budget: the files whose role matters most for
+    the topic and audience are pinned (whole, or their head if very large) into up to
+    PIN_SHARE of the budget; the rest is left to relevance ranking with the remaining
+    tokens, minus the roles with priority 0. Finish with finish_plan() once ranked.
+    """
+    priorities = role_priorities(topic, type_of_user)
+    topic_terms = set(tokenize(topic or ""))
+    files = []
+    for position, (name, text) in enumerate(sections):
+        role = classify(name)
+        score = priorities.get(role, 0)
+        if score:
+            # Files at the root, or named after the topic, first
+            score += (name.count("/") == 0) + 2 * bool(topic_terms & set(tokenize(name)))
+        files.append({"path": name, "role": role, "priority": score, "tokens": count_tokens(text, model),
+                      "position": position})
+    pin_budget = int(token_budget * PIN_SHARE)
+    pinned, exclude, used = [], set(), 0
+    for entry in sorted(files, key=lambda f: (-f["priority"], f["tokens"], f["path"])):
+        if priorities.get(entry["role"], 0) == 0:
+            entry["status"], entry["reason"] = "dropped", f"role {entry['role']} not used for this topic"
+            exclude.add(entry["path"])
+            continue
+        if priorities[entry["role"]] < PIN_PRIORITY:
+            continue
+        text = sections[entry["position"]][1]
+        tokens = entry["tokens"]
+        if tokens > MAX_PINNED_FILE_TOKENS:
+            text = split_section(entry["path"], text, MAX_PINNED_FILE_TOKENS, model)[0]
+            tokens = count_tokens(text, model)
+            entry["truncated"] = True
+        if used + tokens > pin_budget:
+            # Left to relevance ranking
+            entry["reason"] = "pinned share of the budget exhausted"
+            continue
+        used += tokens
+        entry["status"], entry["sent_tokens"] = "pinned", tokens
+        pinned.append((entry["position"], entry["path"], text))
+        exclude.add(entry["path"])
+    return {
+        "token_budget": token_budget,
+        "profile": profile_for_topic(topic),
+        "priorities": priorities,
+        "pinned": [(name, text) for _, name, text in sorted(pinned)],
+        "pinned_tokens": used,
+        "remaining_tokens": token_budget - used,
+        "exclude": exclude,
+        "files": files,
+    }
+
+def finish_plan(plan: dict, retrieved: list, model: str = "gpt-4o") -> dict:
+    """
+    Complete a plan with the chunks chosen by relevance ranking and return a JSON-able
+    report of what was sent and what was dropped (and why).
+    """
+    retrieved_tokens = {}
+    for name, text in retrieved:
+        retrieved_tokens[name] = retrieved_tokens.get(name, 0) + count_tokens(text, model)
+    by_role = {}
+    for entry in plan["files"]:
+        if entry.get("status") != "pinned" and entry["path"] in retrieved_tokens:
+            entry["status"], entry["sent_tokens"] = "retrieved", retrieved_tokens[entry["path"]]
+            entry.pop("reason", None)
+        elif entry.get("status") is None:
+            entry["status"] = "dropped"
+            entry.setdefault("reason", "not relevant enough for the remaining budget")
+        role = by_role.setdefault(entry["role"], {"files": 0, "sent": 0, "dropped": 0,
+                                                  "tokens": 0, "sent_tokens": 0})
+        role["files"] += 1
+        role["tokens"] += entry["tokens"]
+        role["sent_tokens"] += entry.get("sent_tokens", 0)
+        role["sent" if entry["status"] != "dropped" else "dropped"] += 1
+    files = [{k: v for k, v in entry.items() if k != "position"} for entry in plan["files"]]
+    sent = sum(entry.get("sent_tokens", 0) for entry in files)
+    dropped = [entry for entry in files if entry["status"] == "dropped"]
+    print(f":bookmark_tabs: Budget plan ({plan['profile']}): {sent}/{plan['token_budget']} tokens, "
+          f"{sum(e['status'] == 'pinned' for e in files)} files pinned, "
+          f"{sum(e['status'] == 'retrieved' for e in files)} retrieved, {len(dropped)} dropped")
+    return {
+        "token_budget": plan["token_budget"],
+        "profile": plan["profile"],
+        "priorities": plan["priorities"],
+        "sent_tokens": sent,
+        "by_role": by_role,
+        "dropped": sorted(dropped, key=lambda e: (-e["priority"], e["path"])),
+        "files": files,
+    }
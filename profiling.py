@@ -0,0 +1,263 @@
+import asyncio
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# Seconds between RSS samples while a node runs
+RSS_SAMPLE_INTERVAL = 0.02
+
+_current_node = contextvars.ContextVar("profiling_node", default=None)
+_traces = {}
+_lock = threading.Lock()
+
+def _rss_mb():
+    # Current resident set size (ru_maxrss is a process-lifetime high-water mark)
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except Exception:
+        return None
+
+class RssSampler:
+    """
+    Highest RSS seen between start() and stop(), sampled on a background thread.
+    """
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self) -> None:
+        rss = _rss_mb()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> "RssSampler":
+        self._sample()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        return self.peak
+
+def _io_counters():
+    # Bytes read/written by this process through syscalls (files and sockets)
+    try:
+        with open("/proc/self/io", "r") as f:
+            fields = dict(line.split(": ") for line in f.read().splitlines())
+        return int(fields["rchar"]), int(fields["wchar"])
+    except (OSError, KeyError, ValueError):
+        pass
+    try:
+        import psutil
+        io = psutil.Process().io_counters()
+        return io.read_bytes, io.write_bytes
+    except Exception:
+        return None
+
+@contextmanager
+def measure(node: str):
+    """
+    Measure a block as one node record: wall and CPU time, peak RSS while it ran, bytes
+    read and written, plus the LLM calls made inside it (see record_llm_call).
+    CPU time, RSS and I/O are process-wide, so concurrent nodes inflate each other's numbers.
+    """
+    record = {"node": node, "started_at": time.time(), "llm_calls": 0, "llm_cached": 0,
+              "prompt_tokens": 0, "completion_tokens": 0, "llm_latency_s": 0.0, "error": None}
+    token = _current_node.set(record)
+    io_before = _io_counters()
+    sampler = RssSampler().start()
+    cpu_before = time.process_time()
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record["error"] = f"{e.__class__.__name__}: {e}"
+        raise
+    finally:
+        record["wall_s"] = round(time.perf_counter() - start, 4)
+        record["cpu_s"] = round(time.process_time() - cpu_before, 4)
+        record["llm_latency_s"] = round(record["llm_latency_s"], 4)
+        peak = sampler.stop()
+        record["peak_rss_mb"] = round(peak, 1) if peak is not None else None
+        io_after = _io_counters()
+        if io_before and io_after:
+            record["bytes_read"] = io_after[0] - io_before[0]
+            record["bytes_written"] = io_after[1] - io_before[1]
+        else:
+            record["bytes_read"] = record["bytes_written"] = None
+        _current_node.reset(token)
+
+def record_llm_call(model: str, prompt_tokens: int, completion_tokens: int, latency_s: float, cached: bool = False) -> None:
+    """
+    Attribute one model call to the node currently being measured (no-op outside a node).
+    """
+    record = _current_node.get()
+    if record is None:
+        return
+    with _lock:
+        record["llm_calls"] += 1
+        record["llm_cached"] += int(cached)
+        record["prompt_tokens"] += prompt_tokens or 0
+        record["completion_tokens"] += completion_tokens or 0
+        record["llm_latency_s"] += latency_s
+        record.setdefault("models", {})
+        record["models"][model] = record["models"].get(model, 0) + 1
+
+def _trace(run_id: str) -> dict:
+    with _lock:
+        if run_id not in _traces:
+            _traces[run_id] = {"run_id": run_id, "started_at": time.time(), "nodes": []}
+        return _traces[run_id]
+
+def add_node_record(run_id: str, record: dict) -> None:
+    trace = _trace(run_id)
+    with _lock:
+        trace["nodes"].append(record)
+
+def measured_call(node, name: str, *args):
+    """
+    Run node(*args) under measure() and return (result, record). Used for nodes executed
+    in another process, whose record is sent back to the parent's trace.
+    """
+    with measure(name) as record:
+        result = node(*args)
+    return result, record
+
+def instrument_node(name: str, node):
+    """
+    Wrap a graph node so every execution is added to the trace of its state's run_id.
+    """
+    if asyncio.iscoroutinefunction(node):
+        async def async_wrapper(state):
+            with measure(name) as record:
+                try:
+                    return await node(state)
+                finally:
+                    add_node_record(getattr(state, "run_id", "") or "default", record)
+        return async_wrapper
+
+    def wrapper(state):
+        with measure(name) as record:
+            try:
+                return node(state)
+            finally:
+                add_node_record(getattr(state, "run_id", "") or "default", record)
+    return wrapper
+
+def _export_otel(trace: dict) -> None:
+    # Replays the finished run as OpenTelemetry spans: one root span, one child per node
+    try:
+        from opentelemetry import trace as otel_trace
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    except ImportError:
+        print(":warning: opentelemetry-sdk not installed, skipping trace export")
+        return
+    if os.getenv("OTEL_TRACES_EXPORTER", "otlp") == "console":
+        exporter = ConsoleSpanExporter()
+    else:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        exporter = OTLPSpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    tracer = provider.get_tracer("agent_report")
+    ns = lambda seconds: int(seconds * 1e9)
+    root = tracer.start_span("report", start_time=ns(trace["started_at"]), attributes={"run_id": trace["run_id"]})
+    context = otel_trace.set_span_in_context(root)
+    for record in trace["nodes"]:
+        attributes = {key: value for key, value in record.items()
+                      if isinstance(value, (int, float, str, bool)) and key != "started_at"}
+        span = tracer.start_span(record["node"], context=context, start_time=ns(record["started_at"]),
+                                 attributes=attributes)
+        if record.get("error"):
+            span.set_status(otel_trace.Status(otel_trace.StatusCode.ERROR, record["error"]))
+        span.end(end_time=ns(record["started_at"] + record["wall_s"]))
+    root.end(end_time=ns(trace["started_at"] + trace["wall_s"]))
+    provider.shutdown()
+
+def _merge_previous(trace: dict, path: str) -> dict:
+    # A resumed run only executes the nodes after its checkpoint: keep the earlier attempt's
+    # records of the nodes that did not run again
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        return trace
+    if previous.get("run_id") != trace["run_id"]:
+        return trace
+    ran = {record["node"] for record in trace["nodes"]}
+    kept = [record for record in previous.get("nodes", []) if record["node"] not in ran]
+    if kept:
+        trace["nodes"] = sorted(kept + trace["nodes"], key=lambda record: record["started_at"])
+        trace["started_at"] = previous["started_at"]
+        trace["wall_s"] = round(previous.get("wall_s", 0) + trace["wall_s"], 4)
+        trace["attempts"] = previous.get("attempts", 1) + 1
+    return trace
+
+def finish_trace(run_id: str = "default", path: str = None, export: bool = None) -> dict:
+    """
+    Close a run's trace: add totals, write it as JSON to `path` and, when `export` is true
+    (default: TRACE_OTEL=1 in the environment), send it to OpenTelemetry. The trace already
+    at `path` is merged into a resumed run's, and left alone when no node ran.
+    """
+    with _lock:
+        trace = _traces.pop(run_id, None) or {"run_id": run_id, "started_at": time.time(), "nodes": []}
+    trace["wall_s"] = round(time.time() - trace["started_at"], 4)
+    if path and trace["nodes"] and os.path.exists(path):
+        trace = _merge_previous(trace, path)
+    nodes = trace["nodes"]
+    trace["totals"] = {
+        key: round(sum(record.get(key) or 0 for record in nodes), 4)
+        for key in ("wall_s", "cpu_s", "bytes_read", "bytes_written", "llm_calls", "llm_cached",
+                    "prompt_tokens", "completion_tokens", "llm_latency_s")
+    }
+    peaks = [record["peak_rss_mb"] for record in nodes if record.get("peak_rss_mb") is not None]
+    trace["totals"]["peak_rss_mb"] = max(peaks) if peaks else None
+    if path and nodes:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(trace, f, indent=2)
+    if export is None:
+        export = os.getenv("TRACE_OTEL", "0") == "1"
+    if export:
+        _export_otel(trace)
+    return trace
+
+def format_summary(trace: dict) -> str:
+    """
+    Plain-text table of a finished trace, one row per node.
+    """
+    def mb(value):
+        return f"{value / (1024 * 1024):.1f}" if value is not None else "-"
+    header = f"{'node':<22}{'wall s':>9}{'cpu s':>9}{'rss MB':>9}{'read MB':>9}{'write MB':>9}{'llm':>5}{'tok in':>9}{'tok out':>9}{'llm s':>8}"
+    rows = [header, "-" * len(header)]
+    for record in trace["nodes"] + [{"node": "TOTAL", **trace["totals"]}]:
+        rss = record.get("peak_rss_mb")
+        rows.append(
+            f"{record['node'][:21]:<22}{record.get('wall_s') or 0:>9.2f}{record.get('cpu_s') or 0:>9.2f}"
+            f"{(f'{rss:.0f}' if rss is not None else '-'):>9}{mb(record.get('bytes_read')):>9}"
+            f"{mb(record.get('bytes_written')):>9}{int(record.get('llm_calls') or 0):>5}"
+            f"{int(record.get('prompt_tokens') or 0):>9}{int(record.get('completion_tokens') or 0):>9}"
+            f"{record.get('llm_latency_s') or 0:>8.2f}"
+            + ("  ERROR" if record.get("error") else "")
+        )
+    return "\n".join(rows)
@@ -0,0 +1,123 @@
+import os
+import threading
+from pathlib import Path
+from tools import text_to_pdf
+
+STYLE_PATH = os.getenv("PDF_STYLE", "style/style.css")
+# PDF_FAST=1 renders plain-text PDFs with FPDF instead of HTML/CSS with WeasyPrint
+PDF_FAST = os.getenv("PDF_FAST", "0") == "1"
+MARKDOWN_EXTENSIONS = ["extra", "codehilite", "tables"]
+HTML_TEMPLATE = """
+        <html>
+        <head>
+            <meta charset="utf-8">
+            <style>
+                body {{ font-family: sans-serif; margin: 2em; }}
+            </style>
+        </head>
+        <body>
+            {body}
+        </body>
+        </html>
+    """
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+class PDFRenderer:
+    """
+    Long-lived markdown-to-PDF renderer. WeasyPrint, the font configuration and the parsed
+    stylesheet are loaded once and reused for every document; the stylesheet is re-parsed
+    only when its file changes.
+    """
+    def __init__(self, style_path: str = STYLE_PATH):
+        self.style_path = style_path
+        self._lock = threading.Lock()
+        self._weasyprint = None
+        self._font_config = None
+        self._stylesheets = []
+        self._style_mtime = None
+        self._markdown = None
+        self.stats = {"rendered": 0, "fast": 0, "stylesheet_loads": 0}
+
+    def _load(self):
+        if self._weasyprint is None:
+            import weasyprint
+            from weasyprint.text.fonts import FontConfiguration
+            import markdown
+            self._weasyprint = weasyprint
+            self._font_config = FontConfiguration()
+            self._markdown = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+        mtime = os.path.getmtime(self.style_path) if os.path.exists(self.style_path) else None
+        if mtime != self._style_mtime:
+            self._stylesheets = [
+                self._weasyprint.CSS(filename=self.style_path, font_config=self._font_config)
+            ] if mtime is not None else []
+            self._style_mtime = mtime
+            self.stats["stylesheet_loads"] += 1
+
+    def warm(self) -> None:
+        """
+        Load WeasyPrint, fonts and the stylesheet ahead of the first report.
+        """
+        with self._lock:
+            self._load()
+            # A first layout pulls in Pango and the font cache
+            self._weasyprint.HTML(string="<p>warm</p>").write_pdf(
+                stylesheets=self._stylesheets, font_config=self._font_config
+            )
+
+    def render(self, md_text: str, output_path: str, fast: bool = None) -> dict:
+        """
+        Render one markdown document to `output_path`. With `fast` (default: PDF_FAST) the
+        plain FPDF path of tools.text_to_pdf is used instead of WeasyPrint.
+        """
+        output_path = Path(output_path)
+        if PDF_FAST if fast is None else fast:
+            self.stats["fast"] += 1
+            return text_to_pdf(md_text, filename=output_path.name, output_dir=str(output_path.parent))
+        try:
+            with self._lock:
+                self._load()
+                html_content = self._markdown.reset().convert(md_text)
+                self._weasyprint.HTML(string=HTML_TEMPLATE.format(body=html_content)).write_pdf(
+                    target=str(output_path), stylesheets=self._stylesheets, font_config=self._font_config
+                )
+                self.stats["rendered"] += 1
+            return {
+                "success": True,
+                "message": f":white_check_mark: PDF saved to {output_path}",
+                "output_path": str(output_path)
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "message": f":x: Failed to generate PDF: {str(e)}",
+                "output_path": None
+            }
+
+    def render_batch(self, documents: list, fast: bool = None) -> list:
+        """
+        Render [(markdown_text, output_path), ...] with the warm state; one result per document.
+        """
+        return [self.render(md_text, output_path, fast) for md_text, output_path in documents]
+
+def get_renderer() -> PDFRenderer:
+    """
+    Process-wide renderer; pool workers keep theirs for the lifetime of the process.
+    """
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = PDFRenderer()
+        return _renderer
+
+def warm_renderer() -> None:
+    """
+    Process pool initializer: pay WeasyPrint's start-up cost before the first job arrives.
+    """
+    if not PDF_FAST:
+        try:
+            get_renderer().warm()
+        except Exception as e:
+            print(f":warning: PDF renderer warm-up failed: {e}")
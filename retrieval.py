@@ -0,0 +1,170 @@
+import hashlib
+import json
+import math
+import os
+import re
+from collections import Counter
+from summarizer import count_tokens, split_section
+from tools import CACHE_DIR, atomic_write
+
+RETRIEVAL_DIR = CACHE_DIR / "retrieval"
+# Retrieval chunks are much smaller than map chunks so ranking stays precise
+RETRIEVAL_CHUNK_TOKENS = 400
+RETRIEVAL_TOKEN_BUDGET = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", "24000"))
+USE_EMBEDDINGS = os.getenv("RETRIEVAL_EMBEDDINGS", "0") == "1"
+# Per-report sections (topic and audience) stay out of the index so it is shared by every
+# report on a commit; they are always selected
+REQUEST_SECTIONS = {"outputs.json"}
+BM25_K1 = 1.5
+BM25_B = 0.75
+STOPWORDS = {"the", "and", "or", "of", "to", "in", "for", "on", "with", "a", "an", "is", "are", "be",
+             "this", "that", "it", "as", "by", "from", "at", "any", "all", "about", "other"}
+
+def _stem(term: str) -> str:
+    # Light suffix stripping so "installation", "installing" and "install" match
+    for suffix in ("ation", "ing", "ed", "es", "s"):
+        if term.endswith(suffix) and len(term) - len(suffix) >= 4:
+            return term[:-len(suffix)]
+    return term
+
+def tokenize(text: str) -> list:
+    """
+    Lowercased, stemmed word tokens; camelCase and snake_case identifiers are split into words.
+    """
+    text = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", text)
+    return [_stem(t) for t in re.findall(r"[a-z0-9]+", text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+def sections_fingerprint(sections: list) -> str:
+    digest = hashlib.sha1()
+    for name, text in sections:
+        digest.update(name.encode("utf-8", errors="ignore"))
+        digest.update(text.encode("utf-8", errors="ignore"))
+    return digest.hexdigest()
+
+class BM25Index:
+    """
+    Okapi BM25 over file-bounded chunks of the extracted repo.
+    """
+    def __init__(self, chunks: list, fingerprint: str = ""):
+        self.chunks = chunks
+        self.fingerprint = fingerprint
+        self.term_freqs = [Counter(tokenize(chunk["text"])) for chunk in chunks]
+        self.doc_freqs = Counter(term for tf in self.term_freqs for term in tf)
+        self.lengths = [sum(tf.values()) for tf in self.term_freqs]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+    @classmethod
+    def build(cls, sections: list, chunk_tokens: int = RETRIEVAL_CHUNK_TOKENS, model: str = "gpt-4o"):
+        chunks = []
+        for name, text in sections:
+            for piece in split_section(name, text, chunk_tokens, model):
+                chunks.append({"path": name, "text": piece, "tokens": count_tokens(piece, model)})
+        return cls(chunks, sections_fingerprint(sections))
+
+    def search(self, query: str) -> list:
+        """
+        Indices of all chunks, best BM25 match for `query` first (ties keep repo order).
+        """
+        n_docs = len(self.chunks)
+        terms = set(tokenize(query))
+        scores = []
+        for i, tf in enumerate(self.term_freqs):
+            score = 0.0
+            for term in terms:
+                freq = tf.get(term)
+                if not freq:
+                    continue
+                idf = math.log(1 + (n_docs - self.doc_freqs[term] + 0.5) / (self.doc_freqs[term] + 0.5))
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[i] / (self.avg_length or 1))
+                score += idf * freq * (BM25_K1 + 1) / (freq + norm)
+            scores.append(score)
+        return sorted(range(n_docs), key=lambda i: -scores[i])
+
+    def save(self, path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Concurrent jobs on the same commit may save at once: each writes its own file
+        atomic_write(path, json.dumps({"fingerprint": self.fingerprint, "chunks": self.chunks}).encode("utf-8"))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["chunks"], data["fingerprint"])
+
+def load_or_build_index(sections: list, commit: str = None, model: str = "gpt-4o") -> BM25Index:
+    """
+    Reuse the index persisted for `commit` when it was built from the same sections.
+    """
+    fingerprint = sections_fingerprint(sections)
+    path = RETRIEVAL_DIR / f"{commit or fingerprint}.json"
+    if path.exists():
+        try:
+            index = BM25Index.load(path)
+            if index.fingerprint == fingerprint:
+                return index
+        except (OSError, ValueError, KeyError):
+            pass
+    index = BM25Index.build(sections, model=model)
+    index.save(path)
+    return index
+
+def _embedding_ranking(index: BM25Index, query: str, key: str):
+    # Optional dense ranking from a local chroma store, persisted next to the BM25 index
+    try:
+        import chromadb
+    except ImportError:
+        return None
+    try:
+        client = chromadb.PersistentClient(path=str(RETRIEVAL_DIR / "chroma"))
+        name = f"chunks-{key[:40]}"
+        collection = client.get_or_create_collection(name)
+        # The fingerprint is only stored once every chunk is embedded
+        if (collection.metadata or {}).get("fingerprint") != index.fingerprint:
+            client.delete_collection(name)
+            collection = client.create_collection(name)
+            for start in range(0, len(index.chunks), 256):
+                batch = index.chunks[start:start + 256]
+                collection.upsert(ids=[str(start + i) for i in range(len(batch))],
+                                  documents=[chunk["text"] for chunk in batch])
+            collection.modify(metadata={"fingerprint": index.fingerprint})
+        result = collection.query(query_texts=[query], n_results=len(index.chunks))
+        return [int(i) for i in result["ids"][0]]
+    except Exception as e:
+        print(f":warning: Embedding retrieval unavailable, using BM25 only: {e}")
+        return None
+
+def _fuse(*rankings) -> list:
+    # Reciprocal rank fusion
+    scores = Counter()
+    for ranking in rankings:
+        for rank, i in enumerate(ranking):
+            scores[i] += 1.0 / (60 + rank)
+    return [i for i, _ in sorted(scores.items(), key=lambda item: (-item[1], item[0]))]
+
+def retrieve(sections: list, query: str, commit: str = None, token_budget: int = RETRIEVAL_TOKEN_BUDGET,
+             use_embeddings: bool = USE_EMBEDDINGS, model: str = "gpt-4o", exclude: set = None) -> list:
+    """
+    Return the (name, text) chunks most relevant to `query` that fit in `token_budget`
+    tokens, in repo order. The index is persisted per commit under .repo_cache/retrieval.
+    Chunks of the files in `exclude` are skipped (the index itself stays per commit).
+    """
+    request = [(name, text) for name, text in sections if name in REQUEST_SECTIONS and name not in (exclude or ())]
+    used = sum(count_tokens(text, model) for _, text in request)
+    sections = [(name, text) for name, text in sections if name not in REQUEST_SECTIONS]
+    index = load_or_build_index(sections, commit, model)
+    ranking = index.search(query)
+    if use_embeddings:
+        dense = _embedding_ranking(index, query, commit or index.fingerprint)
+        if dense:
+            ranking = _fuse(ranking, dense)
+    selected = []
+    for i in ranking:
+        if exclude and index.chunks[i]["path"] in exclude:
+            continue
+        tokens = index.chunks[i]["tokens"]
+        if used + tokens > token_budget:
+            continue
+        selected.append(i)
+        used += tokens
+    print(f":mag: Selected {len(selected)}/{len(index.chunks)} chunks ({used} tokens) for: {query}")
+    return request + [(index.chunks[i]["path"], index.chunks[i]["text"]) for i in sorted(selected)]
@@ -0,0 +1,230 @@
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+# Lower value = served first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 9
+# Budgets of the OpenAI account tier (per minute); override through the environment
+LLM_RPM = int(os.getenv("LLM_RPM", "500"))
+LLM_TPM = int(os.getenv("LLM_TPM", "300000"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "6"))
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 60.0
+ASYNC_POLL_SECONDS = 0.05
+_retryable_errors = None
+
+def retryable_errors() -> tuple:
+    """
+    OpenAI errors worth retrying; openai is imported on first use, not with the module.
+    """
+    global _retryable_errors
+    if _retryable_errors is None:
+        import openai
+        _retryable_errors = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+    return _retryable_errors
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def retry_after_seconds(error):
+    """
+    Server-requested delay from the Retry-After / retry-after-ms headers, if any.
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+def _usage_tokens(result):
+    usage = getattr(result, "usage", None)
+    return getattr(usage, "total_tokens", None)
+
+class LLMScheduler:
+    """
+    Process-wide admission control for model calls.
+    Calls wait in a priority queue until they are first in line and the requests-per-minute,
+    tokens-per-minute and concurrency budgets allow them. Retryable failures are retried with
+    full-jitter exponential backoff, honouring Retry-After; a 429 pauses every caller.
+    """
+    def __init__(self, rpm: int = LLM_RPM, tpm: int = LLM_TPM, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 max_retries: int = LLM_MAX_RETRIES, base_delay: float = RETRY_BASE_DELAY,
+                 max_delay: float = RETRY_MAX_DELAY):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._requests = deque()
+        self._tokens = deque()
+        self._paused_until = 0.0
+        self.stats = {"requests": 0, "retries": 0, "rate_limited": 0, "failed": 0, "queued_seconds": 0.0}
+
+    def _admit(self, ticket, tokens: int):
+        # Returns (entry, 0) once admitted, otherwise (None, seconds worth waiting)
+        now = time.monotonic()
+        while self._requests and now - self._requests[0] >= 60:
+            self._requests.popleft()
+        while self._tokens and now - self._tokens[0][0] >= 60:
+            self._tokens.popleft()
+        if self._waiting[0] != ticket:
+            return None, ASYNC_POLL_SECONDS
+        if now < self._paused_until:
+            return None, self._paused_until - now
+        if self._in_flight >= self.max_concurrency:
+            return None, 1.0
+        if len(self._requests) >= self.rpm:
+            return None, 60 - (now - self._requests[0])
+        # A single request larger than the whole budget still goes through on an idle window
+        if self._tokens and sum(t for _, t in self._tokens) + tokens > self.tpm:
+            return None, 60 - (now - self._tokens[0][0])
+        heapq.heappop(self._waiting)
+        entry = [now, tokens]
+        self._in_flight += 1
+        self._requests.append(now)
+        self._tokens.append(entry)
+        self.stats["requests"] += 1
+        return entry, 0
+
+    def _enqueue(self, priority: int):
+        ticket = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+        return ticket
+
+    def _withdraw(self, ticket) -> None:
+        with self._cond:
+            if ticket in self._waiting:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+            self._cond.notify_all()
+
+    def acquire(self, tokens: int = 0, priority: int = PRIORITY_NORMAL):
+        start = time.monotonic()
+        ticket = self._enqueue(priority)
+        try:
+            with self._cond:
+                while True:
+                    entry, wait = self._admit(ticket, tokens)
+                    if entry:
+                        break
+                    self._cond.wait(timeout=wait)
+                self.stats["queued_seconds"] += time.monotonic() - start
+                self._cond.notify_all()
+        except BaseException:
+            # An interrupted wait must not leave its ticket blocking the queue
+            self._withdraw(ticket)
+            raise
+        return entry
+
+    async def acquire_async(self, tokens: int = 0, priority: int = PRIORITY_NORMAL):
+        start = time.monotonic()
+        ticket = self._enqueue(priority)
+        try:
+            while True:
+                with self._cond:
+                    entry, wait = self._admit(ticket, tokens)
+                    if entry:
+                        self.stats["queued_seconds"] += time.monotonic() - start
+                        self._cond.notify_all()
+                        return entry
+                await asyncio.sleep(min(wait, ASYNC_POLL_SECONDS))
+        except BaseException:
+            self._withdraw(ticket)
+            raise
+
+    def release(self, entry, actual_tokens: int = None) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            # Replace the estimate with the real usage for the TPM window
+            if actual_tokens is not None:
+                entry[1] = actual_tokens
+            self._cond.notify_all()
+
+    def _retry_delay(self, attempt: int, error) -> float:
+        delay = retry_after_seconds(error)
+        if delay is None:
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        else:
+            delay += random.uniform(0, self.base_delay)
+        with self._cond:
+            self.stats["retries"] += 1
+            if isinstance(error, retryable_errors()[0]):
+                self.stats["rate_limited"] += 1
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        return delay
+
+    def run(self, call, tokens: int = 0, priority: int = PRIORITY_NORMAL):
+        """
+        Run `call()` once admitted, retrying retryable OpenAI errors.
+        """
+        for attempt in range(self.max_retries + 1):
+            entry = self.acquire(tokens, priority)
+            actual = None
+            try:
+                result = call()
+                actual = _usage_tokens(result)
+                return result
+            except retryable_errors() as e:
+                if attempt == self.max_retries:
+                    self.stats["failed"] += 1
+                    raise
+                delay = self._retry_delay(attempt, e)
+            finally:
+                self.release(entry, actual)
+            time.sleep(delay)
+
+    async def run_async(self, call, tokens: int = 0, priority: int = PRIORITY_NORMAL):
+        """
+        Async variant of run; `call()` must return an awaitable.
+        """
+        for attempt in range(self.max_retries + 1):
+            entry = await self.acquire_async(tokens, priority)
+            actual = None
+            try:
+                result = await call()
+                actual = _usage_tokens(result)
+                return result
+            except retryable_errors() as e:
+                if attempt == self.max_retries:
+                    self.stats["failed"] += 1
+                    raise
+                delay = self._retry_delay(attempt, e)
+            finally:
+                self.release(entry, actual)
+            await asyncio.sleep(delay)
+
+def get_scheduler() -> LLMScheduler:
+    """
+    The scheduler shared by every report running in this process.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler()
+    return _scheduler
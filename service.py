@@ -0,0 +1,187 @@
+"""
+Service mode: one long-running process that keeps the compiled graph, the OpenAI clients
+and the PDF renderers warm, and runs report jobs from a queue.
+
+    python service.py --port 8080 --concurrency 4 --cpu-workers 4
+
+    POST /reports           {"repo_url", "type_of_user", "topic"} or {"request": "..."},
+                            optional "fast_pdf" and "run_id" (an unfinished run resumes)
+    GET  /reports           every job of this process
+    GET  /reports/{id}      status and result of one job
+    GET  /reports/{id}/pdf  the rendered report
+    GET  /health            queue, LLM cache and worker state
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from aiohttp import web
+from pydantic import ValidationError
+from agent import UserInput, build_graph
+from batch import RUNS_DIR, run_report
+from checkpoints import get_checkpointer
+from llm import cache_stats, open_clients
+from renderer import warm_renderer
+
+# Jobs waiting beyond this are refused with 503 instead of queueing without bound
+QUEUE_SIZE = int(os.getenv("SERVICE_QUEUE_SIZE", "100"))
+
+class ReportService:
+    """
+    Report jobs over an asyncio queue, at most `concurrency` running at once. Extraction and
+    PDF rendering run on a process pool whose workers warm their renderer once at start.
+    """
+    def __init__(self, concurrency: int = 4, cpu_workers: int = None, queue_size: int = QUEUE_SIZE):
+        self.concurrency = concurrency
+        self.cpu_workers = cpu_workers or os.cpu_count()
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.jobs = {}
+        self.app = None
+        self._pool = None
+        self._workers = []
+        self.started_at = None
+
+    async def start(self) -> None:
+        start = time.perf_counter()
+        # spawn: forking a process that already holds HTTP pools and threads is unsafe
+        context = multiprocessing.get_context("spawn")
+        self._pool = ProcessPoolExecutor(max_workers=self.cpu_workers, mp_context=context, initializer=warm_renderer)
+        self.app = build_graph(cpu_executor=self._pool, checkpointer=get_checkpointer())
+        # Open the pooled HTTP clients the nodes use (the async one lives on the LLM event
+        # loop, not on this one) and start every pool worker (each warms its renderer)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, open_clients)
+        await asyncio.gather(*[loop.run_in_executor(self._pool, os.getpid) for _ in range(self.cpu_workers)])
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        self.started_at = time.time()
+        print(f":fire: Service warm in {time.perf_counter() - start:.1f}s "
+              f"({self.concurrency} jobs at once, {self.cpu_workers} CPU workers)")
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def submit(self, inputs: dict, run_id: str = None) -> dict:
+        """
+        Queue a job; raises asyncio.QueueFull when the queue is full.
+        """
+        # The ID names the job's directory under RUNS_DIR: "." and ".." would escape it
+        if run_id is not None and not re.fullmatch(r"(?!\.+$)[A-Za-z0-9_.-]+", str(run_id)):
+            raise ValueError("run_id may only contain letters, digits, '_', '.' and '-', and not only dots")
+        job_id = run_id or f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        if job_id in self.jobs and self.jobs[job_id]["status"] in ("queued", "running"):
+            return self.jobs[job_id]
+        job = {"job_id": job_id, "status": "queued", "submitted_at": time.time(), "inputs": inputs,
+               "workspace": str(RUNS_DIR / job_id), "pdf_path": "", "error": None}
+        self.queue.put_nowait(job)
+        self.jobs[job_id] = job
+        return job
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self.queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self.queue.task_done()
+
+    async def _run(self, job: dict) -> None:
+        job_id, workspace = job["job_id"], job["workspace"]
+        job["status"], job["started_at"] = "running", time.time()
+        start = time.perf_counter()
+        print(f":rocket: [{job_id}] {job['inputs'].get('repo_url') or 'free-text request'}")
+        job.update(await run_report(self.app, job["inputs"], job_id, workspace))
+        job["seconds"] = round(time.perf_counter() - start, 3)
+        icon = ":white_check_mark:" if job["status"] == "ok" else ":x:"
+        print(f"{icon} [{job_id}] {job['status']} in {job['seconds']:.1f}s {job['pdf_path'] or job['error']}")
+
+    def health(self) -> dict:
+        statuses = [job["status"] for job in self.jobs.values()]
+        return {
+            "status": "ok",
+            "uptime_s": round(time.time() - self.started_at, 1) if self.started_at else 0,
+            "queued": self.queue.qsize(),
+            "running": statuses.count("running"),
+            "finished": statuses.count("ok"),
+            "failed": statuses.count("failed"),
+            "concurrency": self.concurrency,
+            "cpu_workers": self.cpu_workers,
+            "llm_cache": cache_stats(),
+        }
+
+def parse_job(body: dict) -> dict:
+    """
+    Graph inputs of a POST /reports body; raises ValueError or ValidationError when invalid.
+    """
+    if not isinstance(body, dict):
+        raise ValueError("expected a JSON object")
+    inputs = {"fast_pdf": bool(body.get("fast_pdf", False))}
+    if body.get("request"):
+        inputs["request"] = str(body["request"])
+    else:
+        job = UserInput(**{key: body.get(key) for key in ("repo_url", "type_of_user", "topic")})
+        inputs.update(job.model_dump())
+    return inputs
+
+async def create_report(request: web.Request) -> web.Response:
+    service = request.app["service"]
+    try:
+        body = await request.json()
+        job = service.submit(parse_job(body), body.get("run_id"))
+    except (ValueError, ValidationError) as e:
+        return web.json_response({"error": str(e)}, status=400)
+    except asyncio.QueueFull:
+        return web.json_response({"error": "queue full, retry later"}, status=503)
+    return web.json_response(job, status=202)
+
+async def list_reports(request: web.Request) -> web.Response:
+    return web.json_response(list(request.app["service"].jobs.values()))
+
+async def get_report(request: web.Request) -> web.Response:
+    job = request.app["service"].jobs.get(request.match_info["job_id"])
+    if job is None:
+        return web.json_response({"error": "unknown job"}, status=404)
+    return web.json_response(job)
+
+async def get_report_pdf(request: web.Request) -> web.StreamResponse:
+    job = request.app["service"].jobs.get(request.match_info["job_id"])
+    if job is None or not job["pdf_path"] or not os.path.exists(job["pdf_path"]):
+        return web.json_response({"error": "no PDF for this job"}, status=404)
+    return web.FileResponse(job["pdf_path"], headers={"Content-Type": "application/pdf"})
+
+async def health(request: web.Request) -> web.Response:
+    return web.json_response(request.app["service"].health())
+
+def create_app(service: ReportService) -> web.Application:
+    app = web.Application()
+    app["service"] = service
+    app.router.add_post("/reports", create_report)
+    app.router.add_get("/reports", list_reports)
+    app.router.add_get("/reports/{job_id}", get_report)
+    app.router.add_get("/reports/{job_id}/pdf", get_report_pdf)
+    app.router.add_get("/health", health)
+
+    async def lifecycle(app):
+        await service.start()
+        yield
+        await service.stop()
+    app.cleanup_ctx.append(lifecycle)
+    return app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("SERVICE_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SERVICE_PORT", "8080")))
+    parser.add_argument("--concurrency", type=int, default=4, help="reports running at the same time")
+    parser.add_argument("--cpu-workers", type=int, default=None, help="processes for extraction and PDF")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE, help="queued jobs before refusing new ones")
+    args = parser.parse_args()
+    web.run_app(create_app(ReportService(args.concurrency, args.cpu_workers, args.queue_size)),
+                host=args.host, port=args.port)
@@ -0,0 +1,330 @@
+import ast
+import atexit
+import copy
+import fnmatch
+import hashlib
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# "auto" picks per topic (see mode_for_topic), "full" sends raw files, "skeleton" signatures only
+EXTRACTION_MODE = os.getenv("EXTRACTION_MODE", "auto")
+SKELETON_WORKERS = int(os.getenv("SKELETON_WORKERS", str(min(8, os.cpu_count() or 1))))
+# Spawned workers re-import the caller's main module, so the pool only pays off for large repos
+POOL_MIN_BYTES = 16 * 1024 * 1024
+MAX_CONSTANT_CHARS = 200
+# Docstrings are cut to their first paragraph, at most this long
+MAX_DOCSTRING_CHARS = 300
+MAX_COMMENT_LINES = 8
+MAX_HEADER_LINES = 20
+# Brace depth down to which declarations are kept (namespace > class > method)
+MAX_DEPTH = 2
+SKELETON_EXTENSIONS = {".py", ".java", ".js", ".ts", ".cpp", ".c", ".cs", ".rb", ".go", ".rs", ".php"}
+# Build and config scripts whose top-level calls are the content (setup(install_requires=...)),
+# always sent whole
+SETUP_SCRIPTS = {"setup.py", "noxfile.py", "fabfile.py", "conftest.py", "manage.py", "gulpfile.js", "gruntfile.js",
+                 "build.rs", "rakefile.rb"}
+SETUP_SCRIPT_PATTERNS = ("*.config.js", "*.config.ts", "*.config.mjs", "*.config.cjs")
+# Topics answered by structure (signatures, imports, config) rather than function bodies
+SKELETON_TOPICS = ("install", "setup", "set up", "architecture", "overview", "structure", "api", "interface",
+                   "dependenc", "configur", "deploy", "onboard", "module", "design", "getting started")
+FULL_TOPICS = ("bug", "algorithm", "implementation", "logic", "security", "vulnerab", "performance",
+               "test", "refactor", "code review", "optimi")
+
+IMPORT = re.compile(r"^\s*(?:import|from\s+\S+\s+import|package|use|using|require|require_once|include|"
+                    r"include_once|#\s*include|#\s*import|extern\s+crate)\b|^\s*(?:const|let|var)\s+.*=\s*require\(")
+DECLARATION = re.compile(r"^\s*(?:(?:export|default|public|private|protected|internal|static|final|abstract|async|"
+                         r"pub(?:\([\w:]+\))?|unsafe|extern|inline|virtual|override|sealed|partial|open|data)\s+)*"
+                         r"(?:class|interface|struct|enum|trait|impl|type|func|fn|function|def|module|namespace|"
+                         r"record|object|mod)\b")
+CONSTANT = re.compile(r"^\s*(?:export\s+)?(?:pub\s+)?(?:(?:public|private|static|final|const|readonly)\s+)*"
+                      r"(?:const|static|final|let|var|define|#\s*define)\s+(?:[\w<>\[\], ]+\s+)?[A-Z][A-Z0-9_]+\b"
+                      r"|^\s*[A-Z][A-Z0-9_]+\s*=[^=]")
+ARROW = re.compile(r"^\s*(?:export\s+)?(?:const|let|var)\s+\w+\s*(?::[^=]+)?=\s*(?:async\s*)?(?:\([^)]*\)|\w+)\s*(?::[^=]+)?=>")
+CONTROL = {"if", "for", "while", "switch", "catch", "else", "do", "try", "return", "foreach", "elseif", "elif",
+           "with", "synchronized", "lock", "using", "unless", "until", "case", "when", "match", "loop", "new"}
+
+_pool = None
+
+def mode_for_topic(topic: str) -> str:
+    """
+    "skeleton" for structural topics (setup, architecture, APIs), "full" otherwise.
+    """
+    topic = (topic or "").lower()
+    if any(word in topic for word in FULL_TOPICS):
+        return "full"
+    if any(word in topic for word in SKELETON_TOPICS):
+        return "skeleton"
+    return "full"
+
+def is_setup_script(name: str) -> bool:
+    base = name.replace("\\", "/").rsplit("/", 1)[-1].lower()
+    return base in SETUP_SCRIPTS or any(fnmatch.fnmatchcase(base, pattern) for pattern in SETUP_SCRIPT_PATTERNS)
+
+def _is_constant(node) -> bool:
+    if isinstance(node, ast.Assign):
+        targets = node.targets
+    elif isinstance(node, ast.AnnAssign):
+        targets = [node.target]
+    else:
+        return False
+    return all(isinstance(t, ast.Name) and t.id.lstrip("_")[:1].isupper() and t.id.isupper() for t in targets)
+
+def _clip(text: str) -> str:
+    return text if len(text) <= MAX_CONSTANT_CHARS else text[:MAX_CONSTANT_CHARS] + " ..."
+
+def _summary(doc: str) -> str:
+    first = doc.strip().split("\n\n", 1)[0]
+    return first if len(first) <= MAX_DOCSTRING_CHARS else first[:MAX_DOCSTRING_CHARS] + " ..."
+
+def _stub(node):
+    # Same definition with its body reduced to the docstring summary (or "...")
+    stub = copy.copy(node)
+    doc = ast.get_docstring(node)
+    stub.body = [ast.Expr(ast.Constant(_summary(doc)))] if doc else [ast.Expr(ast.Constant(...))]
+    return stub
+
+def _python_nodes(body: list, indent: int, out: list, in_class: bool = False) -> None:
+    pad = "    " * indent
+    for node in body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            out.append(pad + ast.unparse(node))
+        elif _is_constant(node) or (in_class and isinstance(node, ast.AnnAssign)):
+            # Config constants, and typed fields of dataclasses/models
+            out.append(pad + _clip(ast.unparse(node)))
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            out.extend(pad + line for line in ast.unparse(_stub(node)).splitlines())
+        elif isinstance(node, ast.ClassDef):
+            lines = ast.unparse(_stub(node)).splitlines()
+            members = []
+            _python_nodes(node.body, indent + 1, members, in_class=True)
+            if members and not ast.get_docstring(node):
+                lines = lines[:-1]
+            out.extend(pad + line for line in lines)
+            out.extend(members)
+        elif isinstance(node, (ast.If, ast.Try)) and not in_class:
+            test = getattr(node, "test", None)
+            if test is not None and "__main__" in ast.unparse(test):
+                continue
+            # Guarded imports and definitions (try/except ImportError, TYPE_CHECKING)
+            _python_nodes(node.body, indent, out)
+            for handler in getattr(node, "handlers", []):
+                _python_nodes(handler.body, indent, out)
+
+def python_skeleton(source: str) -> str:
+    """
+    Module docstring, imports, constants, and class/function signatures with docstrings.
+    """
+    tree = ast.parse(source)
+    out = []
+    doc = ast.get_docstring(tree)
+    if doc:
+        out.append(ast.unparse(ast.Expr(ast.Constant(_summary(doc)))))
+    _python_nodes(tree.body[1:] if doc is not None else tree.body, 0, out)
+    return "\n".join(out)
+
+def _code_only(line: str, state: dict, ext: str) -> str:
+    # Strip comments and string contents so braces and parentheses can be counted
+    out = []
+    i, n = 0, len(line)
+    while i < n:
+        c = line[i]
+        if state["block"]:
+            end = line.find("*/", i)
+            if end < 0:
+                return "".join(out)
+            state["block"] = False
+            i = end + 2
+            continue
+        if state["quote"]:
+            if c == "\\":
+                i += 2
+                continue
+            if c == state["quote"]:
+                state["quote"] = None
+            i += 1
+            continue
+        if line.startswith("//", i) or (c == "#" and ext == ".rb"):
+            break
+        if line.startswith("/*", i):
+            state["block"] = True
+            i += 2
+            continue
+        if c == "'" and ext == ".rs":
+            # Rust lifetimes ('a) are not strings; char literals are
+            literal = re.match(r"'(?:\\.|[^\\'])'", line[i:])
+            i += len(literal.group()) if literal else 1
+            continue
+        if c in "\"'`":
+            state["quote"] = c
+            out.append(c)
+            i += 1
+            continue
+        out.append(c)
+        i += 1
+    if state["quote"] in ("\"", "'"):
+        # Only template literals span lines
+        state["quote"] = None
+    return "".join(out)
+
+def _is_signature(code: str) -> bool:
+    # `code` is a whole declaration (continuation lines of its parameter list included)
+    if DECLARATION.match(code) or ARROW.match(code):
+        return True
+    stripped = code.strip().lstrip("}").strip()
+    first = re.match(r"[A-Za-z_$][\w$]*", stripped)
+    if not first or first.group() in CONTROL or "(" not in stripped:
+        return False
+    # Block-opening call-like line: function or method definition (not an assignment or call)
+    before_paren = stripped.split("(", 1)[0]
+    opens_block = stripped.endswith("{") or ("{" in stripped and stripped.endswith("}"))
+    return opens_block and "=" not in before_paren and "." not in before_paren
+
+def _signature(parts: list) -> str:
+    signature = " ".join(parts)
+    if signature.endswith("{"):
+        return signature[:-1].rstrip() + " { ... }"
+    if signature.endswith("}") and "{" in signature:
+        # One-line body
+        return signature.split("{", 1)[0].rstrip() + " { ... }"
+    return signature
+
+def generic_skeleton(source: str, ext: str = "") -> str:
+    """
+    Brace-tracking skeleton for C-like languages (and Ruby keywords): file header comment,
+    imports, constants, and declaration signatures with their doc comments.
+    """
+    lines = source.splitlines()
+    state = {"block": False, "quote": None}
+    out, comments = [], []
+    depth = 0
+    seen_code = False
+    i = 0
+    while i < len(lines):
+        raw = lines[i]
+        in_comment = state["block"]
+        code = _code_only(raw, state, ext)
+        start_depth = depth
+        depth = max(0, depth + code.count("{") - code.count("}"))
+        i += 1
+        if not code.strip():
+            if raw.strip() and (in_comment or not state["quote"]):
+                if not seen_code and len(out) < MAX_HEADER_LINES:
+                    out.append(raw.rstrip())
+                elif start_depth <= MAX_DEPTH:
+                    comments.append(raw.rstrip())
+            elif not raw.strip():
+                comments = []
+            continue
+        seen_code = True
+        pad = raw[:len(raw) - len(raw.lstrip())]
+        if start_depth == 0 and IMPORT.match(code):
+            parts = [raw.strip()]
+            # Grouped imports: Go's import ( ... )
+            while code.rstrip().endswith("(") and i < len(lines) and not parts[-1].startswith(")"):
+                parts.append(lines[i].strip())
+                i += 1
+            out.append(" ".join(part for part in parts if part))
+        elif start_depth <= 1 and CONSTANT.match(code):
+            out.append(pad + _clip(raw.strip()))
+        elif start_depth <= MAX_DEPTH and ("(" in code or DECLARATION.match(code)):
+            # Parameter lists spanning several lines are read ahead before deciding
+            parts, codes = [raw.strip()], [code]
+            balance = code.count("(") - code.count(")")
+            lookahead = dict(state)
+            while i + len(parts) - 1 < len(lines) and len(parts) < 6:
+                joined = " ".join(codes).strip()
+                # Stop once the parameter list is closed and the body (or a statement) started;
+                # otherwise read on for "throws ..." clauses and braces on the next line
+                if balance <= 0 and ("(" not in codes[0] or "{" in joined or joined.endswith((";", "}"))
+                                     or len(parts) > 2):
+                    break
+                more = _code_only(lines[i + len(parts) - 1], lookahead, ext)
+                balance += more.count("(") - more.count(")")
+                parts.append(lines[i + len(parts) - 1].strip())
+                codes.append(more)
+            if _is_signature(" ".join(c.strip() for c in codes)):
+                state.update(lookahead)
+                for more in codes[1:]:
+                    depth = max(0, depth + more.count("{") - more.count("}"))
+                i += len(parts) - 1
+                out.extend(comments[-MAX_COMMENT_LINES:])
+                out.append(pad + _signature([part for part in parts if part]))
+        comments = []
+    return "\n".join(out)
+
+def skeletonize(path: str, source: str) -> str:
+    """
+    Skeleton of one source file: `ast` for Python (falling back on syntax errors), the
+    brace-tracking parser for the other languages.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".py":
+        try:
+            return python_skeleton(source)
+        except (SyntaxError, ValueError, RecursionError):
+            pass
+    return generic_skeleton(source, ext)
+
+def _skeletonize_section(item: tuple) -> str:
+    name, text = item
+    header, sep, body = text.partition("\n")
+    if not header.startswith("# --- "):
+        header, sep, body = "", "", text
+    return f"{header}{sep}{skeletonize(name, body)}"
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: the caller may hold threads and HTTP pools that must not be forked
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+    return _pool
+
+def skeletonize_sections(sections: list, workers: int = SKELETON_WORKERS, use_cache: bool = True) -> list:
+    """
+    Replace the source files among (name, text) sections by their skeletons; other sections
+    (README, outputs.json, setup scripts, ...) are kept. Skeletons are cached by content hash and misses
+    are parsed in a process pool.
+    """
+    global _pool
+    cache = None
+    if use_cache:
+        from tools import get_extraction_cache
+        cache = get_extraction_cache()
+    result = list(sections)
+    todo, keys = [], []
+    hits = 0
+    for position, (name, text) in enumerate(sections):
+        if os.path.splitext(name)[1].lower() not in SKELETON_EXTENSIONS or is_setup_script(name):
+            continue
+        key = ("skeleton", hashlib.sha1(f"{name}\0{text}".encode("utf-8", errors="ignore")).hexdigest())
+        cached = cache.get(key) if cache is not None else None
+        if cached is not None:
+            result[position] = (name, cached)
+            hits += 1
+        else:
+            todo.append(position)
+            keys.append(key)
+    items = [sections[position] for position in todo]
+    if workers > 1 and sum(len(text) for _, text in items) >= POOL_MIN_BYTES:
+        chunksize = max(1, len(items) // (workers * 4))
+        try:
+            skeletons = list(_get_pool(workers).map(_skeletonize_section, items, chunksize=chunksize))
+        except BrokenProcessPool as e:
+            print(f":warning: Skeleton pool failed ({e}), parsing in-process")
+            _pool = None
+            skeletons = [_skeletonize_section(item) for item in items]
+    else:
+        skeletons = [_skeletonize_section(item) for item in items]
+    for position, key, skeleton in zip(todo, keys, skeletons):
+        result[position] = (sections[position][0], skeleton)
+        if cache is not None:
+            cache.set(key, skeleton)
+    before = sum(len(text) for _, text in sections)
+    after = sum(len(text) for _, text in result)
+    print(f":scissors: Skeletons: {len(sections)} sections, {before} -> {after} characters "
+          f"({len(todo)} parsed, {hits} cached)")
+    return result
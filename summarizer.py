@@ -0,0 +1,141 @@
+import asyncio
+import os
+from pathlib import Path
+from llm import achat, count_tokens, run_coroutine
+from scheduler import PRIORITY_HIGH, PRIORITY_NORMAL
+from tools import load_code_index, read_code_section
+
+# Context windows of the models used by the pipeline (tokens)
+MODEL_CONTEXT = {"gpt-4o": 128000, "gpt-4o-mini": 128000}
+DEFAULT_CONTEXT = 128000
+# Tokens kept free for the model's answer
+OUTPUT_RESERVE = 4096
+# Size of each map chunk; smaller chunks mean more parallel calls
+CHUNK_TOKENS = 12000
+MAP_CONCURRENCY = int(os.getenv("MAP_CONCURRENCY", "8"))
+MAX_REDUCE_LEVELS = 4
+
+def load_sections(output_dir: str, files: list, store=None) -> list:
+    """
+    Read pipeline artifacts as (name, text) sections. code.txt is split per source file
+    using code_index.json so chunking can respect file boundaries. With an artifact
+    `store`, the other artifacts come from it instead of files in `output_dir`.
+    """
+    sections = []
+    for name in files:
+        path = Path(output_dir) / name
+        if name == "code.txt" and (Path(output_dir) / "code_index.json").exists():
+            for rel_path, entry in load_code_index(output_dir).items():
+                sections.append((rel_path, read_code_section(entry, output_dir).strip("\n")))
+            continue
+        if store is not None:
+            text = store.get_text(name)
+            if text is not None:
+                sections.append((name, f"# --- {name} ---\n{text}"))
+            continue
+        if not path.exists():
+            continue
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            sections.append((name, f"# --- {name} ---\n{f.read()}"))
+    return sections
+
+def split_section(name: str, text: str, max_tokens: int, model: str = "gpt-4o") -> list:
+    """
+    Cut one section into pieces of at most `max_tokens` tokens on line boundaries.
+    """
+    pieces = []
+    current = []
+    current_tokens = 0
+    for line in text.splitlines(keepends=True):
+        tokens = count_tokens(line, model)
+        if current and current_tokens + tokens > max_tokens:
+            pieces.append("".join(current))
+            current, current_tokens = [], 0
+        current.append(line)
+        current_tokens += tokens
+    if current:
+        pieces.append("".join(current))
+    if len(pieces) == 1:
+        return pieces
+    return [f"# --- {name} (part {i + 1}/{len(pieces)}) ---\n{piece}" for i, piece in enumerate(pieces)]
+
+def chunk_sections(sections: list, max_tokens: int = CHUNK_TOKENS, model: str = "gpt-4o") -> list:
+    """
+    Pack (name, text) sections into chunks of at most `max_tokens` tokens. Files are kept
+    whole unless a single file is larger than a chunk.
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+    for name, text in sections:
+        tokens = count_tokens(text, model)
+        if tokens > max_tokens:
+            if current:
+                chunks.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            chunks.extend(split_section(name, text, max_tokens, model))
+            continue
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+async def _complete(semaphore, model: str, system_prompt: str, content: str, temperature: float,
+                    priority: int = PRIORITY_NORMAL) -> str:
+    async with semaphore:
+        return await achat(
+            [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": content},
+            ],
+            model=model,
+            temperature=temperature,
+            priority=priority
+        )
+
+async def map_reduce_async(sections: list, map_prompt: str, reduce_prompt: str, model: str = "gpt-4o",
+                           chunk_tokens: int = CHUNK_TOKENS, concurrency: int = MAP_CONCURRENCY,
+                           temperature: float = 0.3) -> str:
+    """
+    Summarize `sections` of any size.
+    Map: every chunk is sent with `map_prompt`, up to `concurrency` calls in flight.
+    Reduce: partial results are merged level by level (again with `map_prompt`) until they
+    fit the model's context window, then `reduce_prompt` produces the final answer.
+    When everything fits in one chunk this is a single `reduce_prompt` call.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    budget = MODEL_CONTEXT.get(model, DEFAULT_CONTEXT) - OUTPUT_RESERVE
+    chunks = chunk_sections(sections, chunk_tokens, model)
+    if not chunks:
+        return ""
+    if len(chunks) == 1 and count_tokens(reduce_prompt + chunks[0], model) <= budget:
+        return await _complete(semaphore, model, reduce_prompt, chunks[0], temperature, PRIORITY_HIGH)
+
+    partials = await asyncio.gather(*[
+        _complete(semaphore, model, map_prompt, chunk, temperature) for chunk in chunks
+    ])
+    # Hierarchical reduce: merge groups of partials until the rest fits one final call
+    limit = budget - count_tokens(reduce_prompt, model)
+    for _ in range(MAX_REDUCE_LEVELS):
+        if len(partials) == 1 or count_tokens("\n\n".join(partials), model) <= limit:
+            break
+        groups = chunk_sections([(f"part {i + 1}", p) for i, p in enumerate(partials)],
+                                min(limit, max(chunk_tokens, limit // 2)), model)
+        if len(groups) >= len(partials):
+            # Partials cannot be packed any tighter, condense them one by one
+            groups = partials
+        partials = await asyncio.gather(*[
+            _complete(semaphore, model, map_prompt, group, temperature) for group in groups
+        ])
+    # The final call finishes a report, so it jumps the queue of pending map calls
+    return await _complete(semaphore, model, reduce_prompt, "\n\n".join(partials), temperature, PRIORITY_HIGH)
+
+def map_reduce(sections: list, map_prompt: str, reduce_prompt: str, **kwargs) -> str:
+    """
+    Blocking wrapper around map_reduce_async for the synchronous LangGraph nodes.
+    """
+    return run_coroutine(map_reduce_async(sections, map_prompt, reduce_prompt, **kwargs))
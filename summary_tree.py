@@ -0,0 +1,279 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from llm import count_tokens, run_coroutine
+from scheduler import PRIORITY_HIGH
+from summarizer import (CHUNK_TOKENS, DEFAULT_CONTEXT, MAP_CONCURRENCY, MODEL_CONTEXT, OUTPUT_RESERVE, _complete,
+                        map_reduce_async, split_section)
+from tools import CACHE_DIR
+
+# Summarize through the persistent tree (off: plain map-reduce over chunks)
+SUMMARY_TREE = os.getenv("SUMMARY_TREE", "1") != "0"
+SUMMARY_CACHE_DIR = CACHE_DIR / "summaries"
+SUMMARY_CACHE_BYTES = 512 * 1024 * 1024
+# Leaves this small go up the tree as they are, without a model call
+LEAF_RAW_TOKENS = 300
+# Directories whose children's summaries fit in this many tokens are not condensed
+MERGE_MIN_TOKENS = 8000
+# Otherwise children are condensed in groups of about this size; a group also ends after a
+# child whose name hashes to 0 modulo GROUP_FANOUT, so a changed child only moves the
+# boundaries of its own group and not of every group after it
+MERGE_GROUP_TOKENS = 4000
+GROUP_FANOUT = 8
+MAX_MERGE_ROUNDS = 4
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_summary_store():
+    """
+    Content-addressed store of tree summaries, persistent with diskcache (a dict otherwise).
+    Keys are Merkle hashes, so an entry is valid for as long as it exists.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            try:
+                from diskcache import Cache
+                _store = Cache(str(SUMMARY_CACHE_DIR), size_limit=SUMMARY_CACHE_BYTES,
+                               eviction_policy="least-recently-used")
+            except ImportError:
+                _store = {}
+        return _store
+
+def _digest(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+class TreeNode:
+    def __init__(self, name: str, text: str = None):
+        self.name = name
+        self.text = text
+        self.children = {}
+        self.tokens = None
+        self.hash = None
+        self.summary = None
+        self.status = None
+
+    def texts(self) -> list:
+        if self.text is not None:
+            return [self.text]
+        return [text for child in self.children.values() for text in child.texts()]
+
+def build_tree(sections: list) -> TreeNode:
+    """
+    Arrange (path, text) sections by directory, children in name order. Repeated paths
+    (several retrieved chunks of one file) are joined into one leaf.
+    """
+    root = TreeNode("")
+    for path, text in sorted(sections, key=lambda section: section[0]):
+        parts = path.replace("\\", "/").strip("/").split("/")
+        node = root
+        for part in parts[:-1]:
+            node = node.children.setdefault(part, TreeNode(part))
+        leaf = node.children.get(parts[-1])
+        if leaf is not None and leaf.text is not None:
+            leaf.text = f"{leaf.text}\n\n{text}"
+        else:
+            node.children[parts[-1]] = TreeNode(parts[-1], text)
+    return root
+
+class SummaryTree:
+    """
+    Merkle-style summary of a set of sections: every file is summarized on its own, keyed by
+    the hash of its content and the prompt; directories merge the summaries of their
+    children, keyed by the hashes of those children. Summaries live in a persistent store,
+    so after a new commit only the changed files and the directories above them are sent
+    to the model again.
+    """
+    def __init__(self, leaf_prompt: str, merge_prompt: str, model: str = "gpt-4o", store=None,
+                 chunk_tokens: int = CHUNK_TOKENS, concurrency: int = MAP_CONCURRENCY, temperature: float = 0.3):
+        self.leaf_prompt = leaf_prompt
+        self.merge_prompt = merge_prompt
+        self.model = model
+        self.store = store if store is not None else get_summary_store()
+        self.chunk_tokens = chunk_tokens
+        self.temperature = temperature
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.stats = {"leaves": 0, "leaves_summarized": 0, "leaves_reused": 0, "leaves_raw": 0,
+                      "dirs": 0, "dirs_passthrough": 0, "groups_summarized": 0, "groups_reused": 0,
+                      "report_summarized": 0, "report_reused": 0}
+
+    def _size(self, node: TreeNode) -> int:
+        if node.tokens is None:
+            node.tokens = (count_tokens(node.text, self.model) if node.text is not None
+                           else sum(self._size(child) for child in node.children.values()))
+        return node.tokens
+
+    def _pack(self, node: TreeNode) -> None:
+        """
+        Pack runs of small children (files, or whole directories that fit) into shared
+        leaves of up to chunk_tokens, so a cold run makes about as many calls as a plain
+        map-reduce. Past half the budget, runs also end at the name-hash boundaries of merge
+        groups, so a changed file rarely moves the runs after it.
+        """
+        children, run, tokens = {}, [], 0
+
+        def close():
+            if len(run) == 1 and run[0][1].text is not None:
+                children[run[0][0]] = run[0][1]
+            elif run:
+                label = run[0][0] if len(run) == 1 else f"{run[0][0]} .. {run[-1][0]}"
+                leaf = TreeNode(label, "\n\n".join(text for _, child in run for text in child.texts()))
+                leaf.tokens = tokens
+                children[label] = leaf
+            run.clear()
+
+        for name, child in node.children.items():
+            size = self._size(child)
+            if size > self.chunk_tokens:
+                close()
+                tokens = 0
+                children[name] = child
+                continue
+            if run and tokens + size > self.chunk_tokens:
+                close()
+                tokens = 0
+            run.append((name, child))
+            tokens += size
+            if tokens * 2 >= self.chunk_tokens and int(_digest(name)[:8], 16) % GROUP_FANOUT == 0:
+                close()
+                tokens = 0
+        close()
+        node.children = children
+
+    async def _cached(self, key: str, kind: str, compute) -> tuple:
+        summary = self.store.get(key)
+        if summary is not None:
+            self.stats[f"{kind}_reused"] += 1
+            return summary, "reused"
+        summary = await compute()
+        self.store[key] = summary
+        self.stats[f"{kind}_summarized"] += 1
+        return summary, "summarized"
+
+    async def _leaf(self, path: str, node: TreeNode) -> None:
+        self.stats["leaves"] += 1
+        node.hash = _digest("leaf", self.model, self.leaf_prompt, path, node.text)
+        tokens = self._size(node)
+        if tokens <= LEAF_RAW_TOKENS:
+            self.stats["leaves_raw"] += 1
+            node.summary, node.status = node.text, "raw"
+            return
+        if tokens > self.chunk_tokens:
+            # Oversized file: its pieces are the leaves, the file merges them
+            for i, piece in enumerate(split_section(path, node.text, self.chunk_tokens, self.model)):
+                node.children[f"part {i + 1}"] = TreeNode(f"part {i + 1}", piece)
+            node.text, node.tokens = None, None
+            self.stats["leaves"] -= 1
+            await self._dir(path, node)
+            return
+        summary, node.status = await self._cached(node.hash, "leaves", lambda: _complete(
+            self.semaphore, self.model, self.leaf_prompt, node.text, self.temperature))
+        node.summary = f"# --- {path} ---\n{summary}"
+
+    def _groups(self, parts: list) -> list:
+        groups, current, tokens = [], [], 0
+        for name, digest, summary in parts:
+            size = count_tokens(summary, self.model)
+            if current and tokens + size > MERGE_GROUP_TOKENS:
+                groups.append(current)
+                current, tokens = [], 0
+            current.append((name, digest, summary))
+            tokens += size
+            if int(_digest(name)[:8], 16) % GROUP_FANOUT == 0:
+                groups.append(current)
+                current, tokens = [], 0
+        if current:
+            groups.append(current)
+        return groups
+
+    async def _merge_group(self, group: list) -> tuple:
+        key = _digest("group", self.model, self.merge_prompt, [digest for _, digest, _ in group])
+        content = "\n\n".join(summary for _, _, summary in group)
+        summary, status = await self._cached(key, "groups", lambda: _complete(
+            self.semaphore, self.model, self.merge_prompt, content, self.temperature))
+        names = [name for name, _, _ in group]
+        label = names[0] if len(names) == 1 else f"{names[0]} .. {names[-1]}"
+        return (label, key, f"# --- {label} ---\n{summary}"), status
+
+    async def _dir(self, path: str, node: TreeNode) -> None:
+        self.stats["dirs"] += 1
+        self._pack(node)
+        names = list(node.children)
+        await asyncio.gather(*[self._node(f"{path}/{name}".lstrip("/"), node.children[name]) for name in names])
+        node.hash = _digest("dir", self.model, self.merge_prompt,
+                            [(name, node.children[name].hash) for name in names])
+        # Every summary starts with the header of its file or directory
+        parts = [(f"{path}/{name}".lstrip("/"), node.children[name].hash, node.children[name].summary)
+                 for name in names]
+        node.status = "passthrough"
+        for _ in range(MAX_MERGE_ROUNDS):
+            if count_tokens("\n\n".join(summary for _, _, summary in parts), self.model) <= MERGE_MIN_TOKENS:
+                break
+            groups = self._groups(parts)
+            if len(groups) == len(parts) and len(parts) > 1:
+                # Every child is a group of its own: condense them in pairs
+                groups = [parts[i:i + 2] for i in range(0, len(parts), 2)]
+            merged = await asyncio.gather(*[self._merge_group(group) for group in groups])
+            parts = [part for part, _ in merged]
+            node.status = "summarized" if any(status == "summarized" for _, status in merged) else "reused"
+        if node.status == "passthrough":
+            self.stats["dirs_passthrough"] += 1
+        node.summary = "\n\n".join(summary for _, _, summary in parts)
+
+    async def _node(self, path: str, node: TreeNode) -> None:
+        if node.text is not None:
+            await self._leaf(path, node)
+        else:
+            await self._dir(path, node)
+
+    async def summarize(self, sections: list, reduce_prompt: str) -> str:
+        """
+        Summarize `sections` bottom-up, then answer `reduce_prompt` over the root summary.
+        """
+        self.root = build_tree(sections)
+        await self._dir("", self.root)
+        key = _digest("report", self.model, reduce_prompt, self.root.hash)
+        report, _ = await self._cached(key, "report", lambda: _complete(
+            self.semaphore, self.model, reduce_prompt, self.root.summary, self.temperature, PRIORITY_HIGH))
+        return report
+
+    def manifest(self) -> dict:
+        """
+        JSON-able view of the tree: hash and status (raw, summarized, reused, passthrough) per node.
+        """
+        def describe(node):
+            entry = {"hash": node.hash, "status": node.status}
+            if node.children:
+                entry["children"] = {name: describe(child) for name, child in node.children.items()}
+            return entry
+        return {"stats": self.stats, "tree": describe(self.root)}
+
+async def summarize_tree_async(sections: list, leaf_prompt: str, reduce_prompt: str, model: str = "gpt-4o",
+                               store=None, merge_prompt: str = None, **kwargs):
+    """
+    Drop-in for map_reduce_async that reuses the summaries of unchanged files and directories
+    (see SummaryTree). Directories are merged with `merge_prompt` (`reduce_prompt` if not
+    given). Returns (summary, manifest); when everything fits one call the tree is skipped
+    and the manifest is None.
+    """
+    budget = MODEL_CONTEXT.get(model, DEFAULT_CONTEXT) - OUTPUT_RESERVE
+    chunk_tokens = kwargs.get("chunk_tokens", CHUNK_TOKENS)
+    total = sum(count_tokens(text, model) for _, text in sections)
+    if not SUMMARY_TREE or (total <= chunk_tokens and total + count_tokens(reduce_prompt, model) <= budget):
+        return await map_reduce_async(sections, leaf_prompt, reduce_prompt, model=model, **kwargs), None
+    tree = SummaryTree(leaf_prompt, merge_prompt or reduce_prompt, model=model, store=store, **kwargs)
+    summary = await tree.summarize(sections, reduce_prompt)
+    stats = tree.stats
+    print(f":deciduous_tree: Summary tree: {stats['leaves_summarized']}/{stats['leaves']} files and "
+          f"{stats['groups_summarized']} directory groups summarized, "
+          f"{stats['leaves_reused'] + stats['groups_reused']} summaries reused")
+    return summary, tree.manifest()
+
+def summarize_tree(sections: list, leaf_prompt: str, reduce_prompt: str, **kwargs):
+    """
+    Blocking wrapper around summarize_tree_async for the synchronous LangGraph nodes.
+    """
+    return run_coroutine(summarize_tree_async(sections, leaf_prompt, reduce_prompt, **kwargs))
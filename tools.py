@@ -1,13 +1,148 @@
 
 import subprocess
 import os
+import re
+import hashlib
+import json
+import mmap
+import fnmatch
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from fpdf import FPDF
-# Initialize MCP app
+from filelock import FileLock
+from filters import FileFilter, format_report
+
+# Persistent cache root shared by the pipeline (bare mirrors, extraction caches...)
+CACHE_DIR = Path(os.getenv("REPO_CACHE_DIR", os.path.join(os.getcwd(), ".repo_cache")))
+MIRROR_DIR = CACHE_DIR / "mirrors"
+
+def atomic_write(path: Path, data: bytes) -> None:
+    """
+    Replace `path` with `data` in one step: readers see the old or the new file, never a
+    partial one. Each process and thread writes its own temporary file, so concurrent
+    writers of the same path do not clobber each other.
+    """
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+def _git(*args, cwd=None) -> str:
+    result = subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True, check=True)
+    return result.stdout.strip()
+
+def normalize_repo_url(repo_url: str) -> str:
+    """
+    Normalize a repository URL so https, ssh and ".git" variants share one cache key.
+    """
+    url = repo_url.strip()
+    ssh = re.match(r"^(?:ssh://)?git@([^:/]+)[:/](.+)$", url)
+    if ssh:
+        url = f"https://{ssh.group(1)}/{ssh.group(2)}"
+    url = url.rstrip("/")
+    if url.endswith(".git"):
+        url = url[:-4]
+    if url.startswith(("http://", "https://")):
+        host, _, path = url.split("://", 1)[1].partition("/")
+        url = f"https://{host.lower()}/{path}"
+    return url
+
+def mirror_path_for(repo_url: str) -> Path:
+    """
+    Location of the bare mirror cached for a repository URL.
+    """
+    key = normalize_repo_url(repo_url)
+    repo_name = key.split("/")[-1]
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+    return MIRROR_DIR / f"{repo_name}-{digest}.git"
+
+# Branches and tags only: a --mirror refspec also copies every refs/pull/* of GitHub
+MIRROR_REFSPECS = ["+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*"]
+
+def _configure_mirror(mirror: Path) -> None:
+    current = subprocess.run(["git", "config", "--get-all", "remote.origin.fetch"], cwd=mirror,
+                             capture_output=True, text=True).stdout.split()
+    if current == MIRROR_REFSPECS:
+        return
+    if current:
+        _git("config", "--unset-all", "remote.origin.fetch", cwd=mirror)
+    for refspec in MIRROR_REFSPECS:
+        _git("config", "--add", "remote.origin.fetch", refspec, cwd=mirror)
+    if "+refs/*:refs/*" in current:
+        _git("config", "--unset-all", "remote.origin.mirror", cwd=mirror)
+    # Caches made with --mirror: drop the pull request and other refs it fetched
+    stale = [ref for ref in _git("for-each-ref", "--format=%(refname)", cwd=mirror).splitlines()
+             if not ref.startswith(("refs/heads/", "refs/tags/"))]
+    if stale:
+        subprocess.run(["git", "update-ref", "--stdin"], cwd=mirror, check=True, capture_output=True, text=True,
+                       input="".join(f"delete {ref}\n" for ref in stale))
+    # Allow the blob-filtered worktree clones below
+    _git("config", "uploadpack.allowFilter", "true", cwd=mirror)
+
+def update_mirror(repo_url: str) -> Path:
+    """
+    Create the bare mirror (branches and tags) on first use, otherwise fetch only the new
+    objects into it.
+    """
+    mirror = mirror_path_for(repo_url)
+    mirror.parent.mkdir(parents=True, exist_ok=True)
+    # Concurrent runs (threads or processes) on the same repo share one mirror
+    with FileLock(str(mirror) + ".lock"):
+        if (mirror / "HEAD").exists():
+            _configure_mirror(mirror)
+            _git("fetch", "--prune", "--quiet", "origin", cwd=mirror)
+        else:
+            _git("clone", "--bare", "--quiet", repo_url, str(mirror))
+            _configure_mirror(mirror)
+    return mirror
+
+# A mirror fetched in the background this recently is used as is by clone_github_repo
+PREFETCH_MAX_AGE = 300
+_prefetch_pool = None
+_prefetches = {}
+_prefetch_lock = threading.Lock()
+
+def prefetch_mirror(repo_url: str) -> None:
+    """
+    Start updating the mirror of a repository in the background, so the clone node finds it
+    ready (e.g. while the model is still reading the rest of the request).
+    """
+    global _prefetch_pool
+    key = normalize_repo_url(repo_url)
+    with _prefetch_lock:
+        if key in _prefetches and time.time() - _prefetches[key][1] < PREFETCH_MAX_AGE:
+            return
+        if _prefetch_pool is None:
+            _prefetch_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="prefetch")
+        _prefetches[key] = (_prefetch_pool.submit(update_mirror, repo_url), time.time())
+
+def _prefetched_mirror(repo_url: str):
+    with _prefetch_lock:
+        entry = _prefetches.pop(normalize_repo_url(repo_url), None)
+    if entry is None or time.time() - entry[1] > PREFETCH_MAX_AGE:
+        return None
+    try:
+        return entry[0].result()
+    except Exception:
+        # Fetch again in the foreground, where a failure is reported
+        return None
+
+def _checkout_commit(local_path: Path, source: str, commit: str) -> None:
+    _git("fetch", "--depth", "1", "--quiet", source, commit, cwd=local_path)
+    _git("checkout", "--quiet", "--force", "--detach", commit, cwd=local_path)
+    _git("clean", "-fdxq", cwd=local_path)
+
 # Define a tool
-def clone_github_repo(repo_url: str, local_path: str = None) -> dict:
+def clone_github_repo(repo_url: str, local_path: str = None, branch: str = None,
+                      commit: str = None, checkout: bool = True) -> dict:
     """
     Clone a GitHub repository and return the result.
+    The history lives in a bare mirror cache keyed by the normalized URL; repeat requests
+    only fetch new objects and refresh a shallow, single-branch worktree at the new HEAD.
+    Pass `commit` to pin the report to a SHA, and `checkout=False` to only update the mirror
+    (for extract_repo_at_commit, which reads straight from the object database).
     """
     try:
         # If no local path is given, use repo name in a "repo_cloned" folder
@@ -15,20 +150,43 @@ def clone_github_repo(repo_url: str, local_path: str = None) -> dict:
             repo_name = repo_url.rstrip("/").split("/")[-1].replace(".git", "")
             local_path = os.path.join(os.getcwd(), "repo_cloned", repo_name)
         local_path = Path(local_path)
-        local_path.parent.mkdir(parents=True, exist_ok=True)
-        if local_path.exists():
+        if checkout and local_path.exists() and not (local_path / ".git").exists():
             return {
                 "success": False,
-                "message": f"Directory already exists: {local_path}",
+                "message": f"Directory already exists and is not a git worktree: {local_path}",
                 "local_path": str(local_path)
             }
-        # Clone the repository
-        cmd = ["git", "clone", repo_url, str(local_path)]
-        subprocess.run(cmd, capture_output=True, text=True, check=True)
+        mirror = _prefetched_mirror(repo_url) or update_mirror(repo_url)
+        if not branch:
+            branch = _git("symbolic-ref", "--short", "HEAD", cwd=mirror)
+        commit = _git("rev-parse", "--verify", f"{commit or 'refs/heads/' + branch}^{{commit}}", cwd=mirror)
+        if not checkout:
+            return {
+                "success": True,
+                "message": f":white_check_mark: Mirror updated to {commit[:12]}",
+                "local_path": None,
+                "mirror_path": str(mirror),
+                "commit": commit
+            }
+        local_path.parent.mkdir(parents=True, exist_ok=True)
+        source = mirror.resolve().as_uri()
+        if local_path.exists():
+            # Reuse the existing worktree and move it to the requested commit
+            _checkout_commit(local_path, source, commit)
+            message = f":white_check_mark: Repo updated to {commit[:12]} in {local_path}"
+        else:
+            cmd = ["clone", "--quiet", "--depth", "1", "--single-branch", "--branch", branch,
+                   "--filter=blob:none", source, str(local_path)]
+            _git(*cmd)
+            if _git("rev-parse", "HEAD", cwd=local_path) != commit:
+                _checkout_commit(local_path, source, commit)
+            message = f":white_check_mark: Repo cloned to {local_path}"
         return {
             "success": True,
-            "message": f":white_check_mark: Repo cloned to {local_path}",
-            "local_path": str(local_path)
+            "message": message,
+            "local_path": str(local_path),
+            "mirror_path": str(mirror),
+            "commit": commit
         }
     except subprocess.CalledProcessError as e:
         return {
@@ -42,65 +200,460 @@ def clone_github_repo(repo_url: str, local_path: str = None) -> dict:
             "message": f":x: Unexpected error: {str(e)}",
             "local_path": None
         }
-def extract_all_repos_to_txt() -> dict:
+SUPPORTED_EXTENSIONS = [".py", ".java", ".js", ".ts", ".cpp", ".c", ".cs", ".rb", ".go", ".rs", ".php", ".md"]
+# Setup-critical files without a source extension: manifests, build and container files,
+# CI configuration and environment templates (matched case-insensitively on the file name)
+SETUP_FILENAMES = {
+    "dockerfile", "containerfile", "docker-compose.yml", "docker-compose.yaml", "compose.yml", "compose.yaml",
+    "makefile", "gnumakefile", "cmakelists.txt", "justfile", "procfile", "vagrantfile", "jenkinsfile",
+    "pyproject.toml", "setup.cfg", "pipfile", "tox.ini", "environment.yml", "package.json", "tsconfig.json",
+    "go.mod", "cargo.toml", "pom.xml", "build.gradle", "build.gradle.kts", "settings.gradle", "gemfile",
+    "composer.json", ".gitlab-ci.yml", ".travis.yml", "azure-pipelines.yml", "bitbucket-pipelines.yml",
+    ".env.example", ".env.sample", ".env.template", ".nvmrc", ".python-version", ".tool-versions", "install.sh",
+    "setup.sh", "mkdocs.yml"
+}
+# Same, matched on the relative path
+SETUP_PATTERNS = ["requirements*.txt", "dockerfile.*", "*.dockerfile", "docker-compose.*.yml",
+                  ".github/workflows/*.yml", ".github/workflows/*.yaml", ".circleci/config.yml"]
+# Bump when the set of extracted files changes, so cached manifests and outputs are rebuilt
+EXTRACTION_VERSION = 4
+# Drop vendored, generated and duplicate files while extracting (see filters.py)
+EXTRACTION_FILTERS = os.getenv("EXTRACTION_FILTERS", "1") != "0"
+# Streaming limits for code.txt
+WRITE_BUFFER_SIZE = 1024 * 1024
+MAX_FILE_BYTES = 512 * 1024
+MAX_TOTAL_BYTES = 64 * 1024 * 1024
+# Parallel ingestion of checked-out files
+INGEST_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+INGEST_BATCH_SIZE = 16
+MMAP_THRESHOLD = 256 * 1024
+BINARY_SNIFF_BYTES = 8000
+# Content-addressed cache of extracted blobs (LRU, size-bounded)
+EXTRACT_CACHE_DIR = CACHE_DIR / "extract"
+EXTRACT_CACHE_BYTES = 2 * 1024 * 1024 * 1024
+_extract_cache = None
+
+def _is_setup_file(rel_path: str) -> bool:
+    rel_path = rel_path.replace("\\", "/")
+    name = rel_path.rsplit("/", 1)[-1]
+    if name.lower() in ("readme.md", *SETUP_FILENAMES):
+        return True
+    lowered = rel_path.lower()
+    return any(fnmatch.fnmatchcase(lowered, pattern) or fnmatch.fnmatchcase(name.lower(), pattern)
+               for pattern in SETUP_PATTERNS)
+
+def _is_wanted(rel_path: str) -> bool:
+    return Path(rel_path).suffix in SUPPORTED_EXTENSIONS or _is_setup_file(rel_path)
+
+def make_file_filter():
+    """
+    Filter for one extraction, or None when EXTRACTION_FILTERS is off. README and
+    setup-critical files are never dropped as generated or duplicate.
+    """
+    return FileFilter(exempt=_is_setup_file) if EXTRACTION_FILTERS else None
+
+def _is_binary(data) -> bool:
+    # Same heuristic as git: a NUL byte near the start means binary
+    return b"\0" in data[:BINARY_SNIFF_BYTES]
+
+def _dir_size(path: Path) -> int:
+    """
+    Total size in bytes of the files under `path` (sizes only, nothing is read).
+    """
+    total = 0
+    for root, _, files in os.walk(path):
+        for file in files:
+            try:
+                total += os.lstat(os.path.join(root, file)).st_size
+            except OSError:
+                pass
+    return total
+
+def _read_text_file(full_path: Path, limit: int = None):
+    """
+    Read up to `limit` bytes of a file as text, memory-mapping large files.
+    Returns (content, error); content is None for binary files.
+    """
+    try:
+        with open(full_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size >= MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if _is_binary(mm[:BINARY_SNIFF_BYTES]):
+                        return None, None
+                    data = mm[:limit] if limit else mm[:]
+            else:
+                data = f.read(limit or -1)
+                if _is_binary(data):
+                    return None, None
+        return data.decode("utf-8", errors="ignore").replace("\r\n", "\n"), None
+    except Exception as e:
+        return None, e
+
+def iter_worktree_files(repo_dir: Path, limit: int = None, workers: int = INGEST_WORKERS, file_filter=None):
+    """
+    Yield (relative_path, content, error) for every wanted text file of a checked-out repo.
+    Files are read by a pool of `workers` threads (at most `limit` bytes each, binary files
+    skipped) and yielded in sorted walk order, so the output is deterministic.
+    With a `file_filter` (see make_file_filter) .gitignore files are honoured and vendor or
+    build directories are pruned before the walk descends into them.
+    """
+    def wanted_paths():
+        for root, dirs, files in os.walk(repo_dir):
+            rel_root = Path(root).relative_to(repo_dir).as_posix()
+            rel_root = "" if rel_root == "." else rel_root
+            dirs[:] = sorted(d for d in dirs if d != ".git")
+            if file_filter is not None:
+                if ".gitignore" in files:
+                    content, _ = _read_text_file(Path(root) / ".gitignore")
+                    file_filter.add_gitignore(rel_root, content or "")
+                dirs[:] = [d for d in dirs if not file_filter.prune_dir(
+                    f"{rel_root}/{d}".lstrip("/"), lambda d=d: _dir_size(Path(root) / d))]
+            for file in sorted(files):
+                full_path = Path(root) / file
+                rel_path = str(full_path.relative_to(repo_dir))
+                if not _is_wanted(rel_path):
+                    continue
+                if file_filter is not None:
+                    rule = file_filter.path_rule(rel_path)
+                    if rule:
+                        file_filter.remove(rule, full_path.stat().st_size)
+                        continue
+                yield rel_path, full_path
+
+    def finished(rel_path, result):
+        content, error = result
+        if content is not None or error is not None:
+            yield rel_path, content, error
+
+    if workers <= 1:
+        for rel_path, full_path in wanted_paths():
+            yield from finished(rel_path, _read_text_file(full_path, limit))
+        return
+
+    def read_batch(batch):
+        return [(rel_path, _read_text_file(full_path, limit)) for rel_path, full_path in batch]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Files are read in small batches to amortize scheduling overhead, and only a
+        # bounded window of batches is in flight so memory stays flat on huge repos
+        pending = deque()
+        batch = []
+        for item in wanted_paths():
+            batch.append(item)
+            if len(batch) == INGEST_BATCH_SIZE:
+                pending.append(pool.submit(read_batch, batch))
+                batch = []
+                if len(pending) >= workers * 2:
+                    for rel_path, result in pending.popleft().result():
+                        yield from finished(rel_path, result)
+        if batch:
+            pending.append(pool.submit(read_batch, batch))
+        while pending:
+            for rel_path, result in pending.popleft().result():
+                yield from finished(rel_path, result)
+
+class GitBlobReader:
+    """
+    Long-lived `git cat-file --batch` pipe: one git process serves every blob of an extraction.
+    """
+    def __init__(self, git_dir):
+        self.proc = subprocess.Popen(["git", "cat-file", "--batch"], cwd=git_dir,
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def read(self, sha: str, limit: int = None) -> bytes:
+        self.proc.stdin.write(f"{sha}\n".encode("ascii"))
+        self.proc.stdin.flush()
+        header = self.proc.stdout.readline().split()
+        if len(header) != 3:
+            raise KeyError(f"Object not found: {sha}")
+        size = int(header[2])
+        keep = size if limit is None else min(size, limit)
+        data = self.proc.stdout.read(keep)
+        # Drain the rest of an oversized blob without holding it in memory
+        remaining = size - keep
+        while remaining:
+            remaining -= len(self.proc.stdout.read(min(remaining, WRITE_BUFFER_SIZE)))
+        self.proc.stdout.read(1)  # trailing newline after each object
+        return data
+
+    def close(self) -> None:
+        self.proc.stdin.close()
+        self.proc.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def list_commit_tree(git_dir, commit: str = "HEAD", paths: list = None) -> list:
+    """
+    List the blobs of a commit as dicts with path, sha and size, without reading any content.
+    """
+    cmd = ["git", "ls-tree", "-r", "-z", "--long", commit]
+    if paths:
+        cmd += ["--", *paths]
+    out = subprocess.run(cmd, cwd=git_dir, capture_output=True, check=True).stdout
+    entries = []
+    for record in out.split(b"\0"):
+        if not record:
+            continue
+        meta, path = record.split(b"\t", 1)
+        mode, obj_type, sha, size = meta.split()
+        # Skip submodules and symlinks
+        if obj_type != b"blob" or mode == b"120000":
+            continue
+        entries.append({"path": path.decode("utf-8", errors="replace"), "sha": sha.decode("ascii"), "size": int(size)})
+    return entries
+
+def get_extraction_cache():
+    """
+    Shared on-disk cache of blob contents and per-commit manifests, or None if diskcache
+    is not installed. Least recently used entries are evicted past EXTRACT_CACHE_BYTES.
+    """
+    global _extract_cache
+    if _extract_cache is None:
+        try:
+            from diskcache import Cache
+        except ImportError:
+            return None
+        _extract_cache = Cache(str(EXTRACT_CACHE_DIR), size_limit=EXTRACT_CACHE_BYTES,
+                               eviction_policy="least-recently-used")
+    return _extract_cache
+
+def iter_commit_files(git_dir, commit: str = "HEAD", paths: list = None, limit: int = None,
+                      cache=None, stats: dict = None, file_filter=None):
+    """
+    Yield (relative_path, content, error) for every wanted text file of a commit, streamed from
+    the object database. Path and extension filters run before any blob is read, and at
+    most `limit` bytes of each blob are kept.
+    With a `cache` (see get_extraction_cache) the file list of the commit and every blob are
+    looked up by SHA first, so only blobs changed since a previous extraction hit git.
+    `stats` is filled with cache_hits / blobs_read counters.
+    With a `file_filter` (see make_file_filter) the .gitignore files of the commit are
+    honoured and files under vendor or build directories are dropped before being read.
+    """
+    stats = stats if stats is not None else {}
+    stats.setdefault("cache_hits", 0)
+    stats.setdefault("blobs_read", 0)
+    manifest_key = ("manifest", EXTRACTION_VERSION, commit, tuple(paths or ()))
+    manifest = cache.get(manifest_key) if cache is not None else None
+    if manifest is None:
+        tree = list_commit_tree(git_dir, commit, paths)
+        manifest = {
+            "entries": [e for e in tree if _is_wanted(e["path"])],
+            "gitignores": [e for e in tree if e["path"].rsplit("/", 1)[-1] == ".gitignore"],
+        }
+        if cache is not None:
+            cache.set(manifest_key, manifest)
+    reader = None
+
+    def read_blob(entry):
+        nonlocal reader
+        blob_key = ("blob", entry["sha"], limit)
+        data = cache.get(blob_key) if cache is not None else None
+        if data is not None:
+            stats["cache_hits"] += 1
+            return data
+        # Start the cat-file pipe only once a blob is actually missing
+        reader = reader or GitBlobReader(git_dir)
+        data = reader.read(entry["sha"], limit)
+        stats["blobs_read"] += 1
+        if cache is not None:
+            cache.set(blob_key, data)
+        return data
+
+    try:
+        entries = manifest["entries"]
+        if file_filter is not None:
+            for entry in sorted(manifest["gitignores"], key=lambda e: e["path"].count("/")):
+                try:
+                    text = read_blob(entry).decode("utf-8", errors="ignore")
+                except Exception as e:
+                    print(f":warning: Could not read {entry['path']}: {e}")
+                    continue
+                file_filter.add_gitignore(entry["path"].rpartition("/")[0], text)
+            entries = [e for e in entries if file_filter.keep_path(e["path"], e["size"])]
+        for entry in entries:
+            try:
+                data = read_blob(entry)
+            except Exception as e:
+                yield entry["path"], None, e
+                continue
+            if not _is_binary(data):
+                yield entry["path"], data.decode("utf-8", errors="ignore"), None
+    finally:
+        if reader is not None:
+            reader.close()
+
+def write_extraction(files, output_dir: Path, max_file_bytes: int = MAX_FILE_BYTES,
+                     max_total_bytes: int = MAX_TOTAL_BYTES, source: str = None, file_filter=None) -> dict:
+    """
+    Stream code.txt and readme.txt from (relative_path, content, error) tuples.
+    Each section goes to disk as soon as it arrives through a fixed-size buffer, files are
+    capped at `max_file_bytes` and the whole dump at `max_total_bytes`. code_index.json
+    records the byte offset and length of every section (see read_code_section), plus the
+    `source` identifier used to skip rewriting an unchanged extraction.
+    With a `file_filter`, files failing its content rules are left out and its report of
+    what each rule removed is returned (and indexed) as "filtered".
+    """
+    code_file = output_dir / "code.txt"
+    readme_file = output_dir / "readme.txt"
+    index_file = output_dir / "code_index.json"
+    index = []
+    readme_text = None
+    readme_depth = None
+    total = 0
+    skipped = 0
+    if file_filter is not None:
+        files = file_filter.filter(files)
+    with open(code_file, "wb", buffering=WRITE_BUFFER_SIZE) as out:
+        for rel_path, content, error in files:
+            # Extract code and setup files
+            if _is_wanted(rel_path):
+                if total >= max_total_bytes:
+                    skipped += 1
+                else:
+                    body = content if error is None else f"[ERROR reading file: {error}]"
+                    body = body.encode("utf-8", errors="ignore")
+                    truncated = len(body) > max_file_bytes
+                    section = f"\n# --- {rel_path} ---\n".encode("utf-8") + body[:max_file_bytes]
+                    if index:
+                        out.write(b"\n")
+                        total += 1
+                    if len(section) > max_total_bytes - total:
+                        section = section[:max(max_total_bytes - total, 0)]
+                        truncated = True
+                    out.write(section)
+                    index.append({"path": rel_path, "offset": total, "length": len(section), "truncated": truncated})
+                    total += len(section)
+            # Read README.md, the shallowest one when there are several (git lists
+            # .github/README.md before the root one)
+            depth = rel_path.replace("\\", "/").count("/")
+            if Path(rel_path).name.lower() == "readme.md" and (readme_depth is None or depth < readme_depth):
+                readme_text = content if error is None else f"[ERROR reading README.md: {error}]"
+                readme_depth = depth
+    # Write readme if exists
+    if readme_text:
+        with open(readme_file, "w", encoding="utf-8", errors="ignore") as f:
+            f.write(readme_text)
+    written = {
+        "code_file": str(code_file),
+        "readme_file": str(readme_file) if readme_text else "README.md not found",
+        "index_file": str(index_file),
+        "total_bytes": total,
+        "skipped_files": skipped
+    }
+    if file_filter is not None:
+        written["filtered"] = file_filter.report()
+    # The index is written last, so it only exists for a complete extraction
+    with open(index_file, "w", encoding="utf-8") as f:
+        json.dump({**written, "source": source, "files": index}, f, indent=2)
+    return written
+
+def load_code_index(output_dir: str = "repo_cloned/OUTPUT") -> dict:
+    """
+    Load code_index.json as a {relative_path: entry} mapping.
+    """
+    with open(Path(output_dir) / "code_index.json", "r", encoding="utf-8") as f:
+        return {entry["path"]: entry for entry in json.load(f)["files"]}
+
+def read_code_section(entry: dict, output_dir: str = "repo_cloned/OUTPUT") -> str:
+    """
+    Read one file's section of code.txt by seeking to its indexed offset.
+    """
+    with open(Path(output_dir) / "code.txt", "rb") as f:
+        f.seek(entry["offset"])
+        return f.read(entry["length"]).decode("utf-8", errors="ignore")
+
+def extract_all_repos_to_txt(workers: int = INGEST_WORKERS, base_dir: str = "repo_cloned") -> dict:
     """
     Extracts code from all repos inside repo_cloned/ and writes to plain .txt files in repo_cloned/OUTPUT/.
     Also extracts README.md (if present) as readme.txt.
+    Pass `base_dir` to work inside an isolated run workspace instead of repo_cloned/.
     """
     
-    base_dir = Path("repo_cloned")
+    base_dir = Path(base_dir)
     output_dir = base_dir / "OUTPUT"
     output_dir.mkdir(parents=True, exist_ok=True)
-    supported_extensions = [".py", ".java", ".js", ".ts", ".cpp", ".c", ".cs", ".rb", ".go", ".rs", ".php", ".md"]
     results = []
     for repo_dir in base_dir.iterdir():
         if repo_dir.is_dir() and repo_dir.name != "OUTPUT":
-            repo_name = repo_dir.name
-            code_file = output_dir / "code.txt"
-            readme_file = output_dir / "readme.txt"
-            code_lines = []
-            readme_text = None
-            for root, _, files in os.walk(repo_dir):
-                for file in files:
-                    full_path = Path(root) / file
-                    # Extract code files
-                    if full_path.suffix in supported_extensions:
-                        try:
-                            with open(full_path, "r", encoding="utf-8", errors="ignore") as f:
-                                content = f.read()
-                                code_lines.append(f"\n# --- {full_path.relative_to(repo_dir)} ---\n{content}")
-                        except Exception as e:
-                            code_lines.append(f"\n# --- {full_path.relative_to(repo_dir)} ---\n[ERROR reading file: {e}]")
-                    # Read README.md if found
-                    if file.lower() == "readme.md" and readme_text is None:
-                        try:
-                            with open(full_path, "r", encoding="utf-8", errors="ignore") as f:
-                                readme_text = f.read()
-                        except Exception as e:
-                            readme_text = f"[ERROR reading README.md: {e}]"
-            # Write code dump
-            with open(code_file, "w", encoding="utf-8", errors="ignore") as f:
-                f.write("\n".join(code_lines))
-            # Write readme if exists
-            if readme_text:
-                with open(readme_file, "w", encoding="utf-8", errors="ignore") as f:
-                    f.write(readme_text)
-            results.append({
-                "repo": repo_name,
-                "code_file": str(code_file),
-                "readme_file": str(readme_file) if readme_text else "README.md not found"
-            })
+            file_filter = make_file_filter()
+            files = iter_worktree_files(repo_dir, limit=MAX_FILE_BYTES + 1, workers=workers, file_filter=file_filter)
+            written = write_extraction(files, output_dir, file_filter=file_filter)
+            if file_filter is not None:
+                print(format_report(written["filtered"]))
+            results.append({"repo": repo_dir.name, **written})
     print(":white_check_mark: Finished writing readme.txt and code.txt")
     return {
         "success": True,
         "message": ":white_check_mark: Code and README extraction complete",
         "repos": results
     }
-def text_to_pdf(text: str, filename: str = "output.pdf") -> dict:
+
+def _previous_extraction(output_dir: Path, source: str):
+    index_file = output_dir / "code_index.json"
+    try:
+        with open(index_file, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if index.get("source") != source or not (output_dir / "code.txt").exists():
+        return None
+    return {key: value for key, value in index.items() if key not in ("source", "files")}
+
+def extract_repo_at_commit(git_dir: str, commit: str = "HEAD", paths: list = None,
+                           output_dir: str = "repo_cloned/OUTPUT", use_cache: bool = True) -> dict:
+    """
+    Checkout-free variant of extract_all_repos_to_txt: reads the tree of `commit` straight
+    from a (bare) repository, so no working tree is written or walked.
+    With `use_cache`, an output_dir already holding this commit is left untouched and blobs
+    seen in earlier extractions come from the content-addressed cache.
+    """
+    try:
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        commit = _git("rev-parse", "--verify", f"{commit}^{{commit}}", cwd=git_dir)
+        file_filter = make_file_filter()
+        source = (f"{commit}:{','.join(paths or [])}:{MAX_FILE_BYTES}:{MAX_TOTAL_BYTES}:v{EXTRACTION_VERSION}"
+                  f"{':filtered' if file_filter is not None else ''}")
+        if use_cache:
+            previous = _previous_extraction(output_dir, source)
+            if previous:
+                print(f":white_check_mark: readme.txt and code.txt already up to date at {commit[:12]}")
+                return {
+                    "success": True,
+                    "message": ":white_check_mark: Extraction unchanged, reused existing output",
+                    "repos": [{"repo": Path(git_dir).name, "commit": commit, **previous}]
+                }
+        stats = {}
+        cache = get_extraction_cache() if use_cache else None
+        files = iter_commit_files(git_dir, commit, paths, limit=MAX_FILE_BYTES + 1, cache=cache, stats=stats,
+                                  file_filter=file_filter)
+        written = write_extraction(files, output_dir, source=source, file_filter=file_filter)
+        if file_filter is not None:
+            print(format_report(written["filtered"]))
+        print(f":white_check_mark: Finished writing readme.txt and code.txt at {commit[:12]} "
+              f"({stats['blobs_read']} blobs read, {stats['cache_hits']} from cache)")
+        return {
+            "success": True,
+            "message": ":white_check_mark: Code and README extraction complete",
+            "repos": [{"repo": Path(git_dir).name, "commit": commit, **written, **stats}]
+        }
+    except subprocess.CalledProcessError as e:
+        stderr = e.stderr.decode(errors="ignore") if isinstance(e.stderr, bytes) else e.stderr
+        return {
+            "success": False,
+            "message": f":x: Extraction failed: {stderr.strip() if stderr else str(e)}",
+            "repos": []
+        }
+def text_to_pdf(text: str, filename: str = "output.pdf", output_dir: str = None) -> dict:
     from fpdf import FPDF
     from pathlib import Path
     try:
-        base_dir = Path.cwd() / "repo_cloned" / "OUTPUT"
+        base_dir = Path(output_dir) if output_dir else Path.cwd() / "repo_cloned" / "OUTPUT"
         base_dir.mkdir(parents=True, exist_ok=True)
         output_path = base_dir / filename
         print(f":page_facing_up: Writing PDF to: {output_path}")